@@ -1,16 +1,32 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
+from app.replica import RoutingSession
 
-db = SQLAlchemy()
+# Сессия выбирает базу для каждого запроса: основную или реплику (app/replica.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 def create_app(config_class=Config):
     app = Flask(__name__) 
     
     app.config.from_object(config_class)
 
+    # За обратным прокси remote_addr - адрес прокси: берем адрес клиента из
+    # X-Forwarded-For (ограничение попыток входа считается по нему)
+    if app.config.get('PROXY_FIX_X_FOR'):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
+    from app import pool, profiler, replica
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = pool.engine_options(app.config)
+    replica.configure(app)
     db.init_app(app)
 
+    from app import sessions, ratelimit, notifications
+    sessions.init_app(app)
+    ratelimit.init_app(app)
+    notifications.init_app(app)
+
     def date_fmt(date_obj):
         if date_obj:
             return date_obj.strftime('%d.%m.%Y')
@@ -24,14 +40,45 @@ def create_app(config_class=Config):
             return "0,00 BYN"
     app.jinja_env.filters['rubles'] = rubles_fmt
 
+    from app.pagination import page_url
+    app.jinja_env.globals['page_url'] = page_url
+
     from app.routes import auth_bp, main_bp, admin_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(admin_bp)
 
+    from app import http_cache
+    http_cache.init_app(app)
+
+    from app.dashboard import dashboard_cli
+    from app.search import search_cli
+    from app.importer import supplies_cli
+    from app.status_history import history_cli
+    from app.reports import reports_cli
+    from app.catalog import catalog_cli
+    from app.jobs import jobs_cli
+    app.cli.add_command(dashboard_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(supplies_cli)
+    app.cli.add_command(history_cli)
+    app.cli.add_command(reports_cli)
+    app.cli.add_command(catalog_cli)
+    app.cli.add_command(jobs_cli)
+
     with app.app_context():
+        pool.init_app(app, db.engine)
+        replica.init_app(app, db.engines)
+        profiler.init_app(app, list(db.engines.values()))
         from app import models
+        # Создаем недостающие таблицы (служебные таблицы статистики и т.п.);
+        # только в основной базе - реплика получает их репликацией
+        db.create_all(bind_key=None)
+        from app import cache
+        cache.init_app(app)
+        from app import dashboard
+        dashboard.init_app(app)
         models.ensure_admin_user()
 
 
@@ -0,0 +1,75 @@
+from sqlalchemy import select, update
+from app import db
+from app.models import Part, Supply, CatalogItem
+from app import catalog
+from app import reports
+
+# Выдача запчастей в заказ по виду: "N штук вида X" вместо выбора конкретных
+# экземпляров. Берутся самые старые свободные экземпляры (по дате поставки,
+# затем по part_id). Строки блокируются SELECT ... FOR UPDATE SKIP LOCKED:
+# параллельные выдачи того же вида берут разные экземпляры и не ждут друг
+# друга. Условие work_order_id IS NULL повторяется в UPDATE для СУБД без
+# FOR UPDATE (SQLite): проигравшая гонку выдача берет следующие экземпляры.
+
+
+class InsufficientStock(Exception):
+
+    def __init__(self, name, requested, available):
+        super().__init__(f'{name}: запрошено {requested}, свободно {available}')
+        self.name = name
+        self.requested = requested
+        self.available = available
+
+
+def oldest_free_parts(name, quantity):
+    # part_id самых старых свободных экземпляров вида, заблокированные до конца транзакции
+    return db.session.execute(
+        select(Part.part_id)
+        .join(Supply, Part.supply_id == Supply.supply_id)
+        .where(Part.name == name, Part.work_order_id.is_(None))
+        .order_by(Supply.supply_date, Part.part_id)
+        .limit(quantity)
+        .with_for_update(of=Part, skip_locked=True)
+    ).scalars().all()
+
+
+def allocate(order_id, name, quantity):
+    """Устанавливает в заказ quantity самых старых свободных запчастей вида name.
+
+    Возвращает part_id выданных запчастей; при нехватке бросает InsufficientStock
+    (выданное в этой транзакции откатывает вызывающий). Счетчики каталога и
+    отметки отчетов обновляются; коммит и откат за вызывающим.
+    """
+    allocated = []
+    while len(allocated) < quantity:
+        needed = quantity - len(allocated)
+        part_ids = oldest_free_parts(name, needed)
+        if len(part_ids) < needed:
+            raise InsufficientStock(name, quantity, len(allocated) + len(part_ids))
+        result = db.session.execute(
+            update(Part)
+            .where(Part.part_id.in_(part_ids), Part.work_order_id.is_(None))
+            .values(work_order_id=order_id)
+        )
+        if result.rowcount == len(part_ids):
+            allocated.extend(part_ids)
+        else:
+            # Без блокировок строк часть экземпляров заняла параллельная транзакция:
+            # оставляем доставшиеся и берем следующие по возрасту
+            allocated.extend(db.session.scalars(
+                select(Part.part_id).where(Part.part_id.in_(part_ids), Part.work_order_id == order_id)
+            ))
+
+    # Все выданные экземпляры были свободны
+    if allocated:
+        catalog.apply_delta({name: (-len(allocated), len(allocated))})
+        reports.mark_orders_dirty([order_id])
+    return allocated
+
+
+def allocate_item(order_id, catalog_item_id, quantity):
+    item = db.session.get(CatalogItem, catalog_item_id)
+    if item is None:
+        raise InsufficientStock(f'#{catalog_item_id}', quantity, 0)
+    return allocate(order_id, item.name, quantity)
+
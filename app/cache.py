@@ -0,0 +1,193 @@
+import threading
+from collections import OrderedDict
+from flask import request, current_app, has_app_context
+from markupsafe import Markup
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.orm import Session
+from app import db
+from app.models import CacheVersion
+
+# Кэш отрендеренных фрагментов списков (таблица + пагинация). Ключ - endpoint и
+# все параметры строки запроса (q, date, status, курсоры). Каждый фрагмент
+# зависит от набора таблиц; у таблицы есть версия в cache_version, которая
+# увеличивается в той же транзакции, что изменила таблицу (ORM-flush или
+# пакетный INSERT/UPDATE/DELETE через session.execute). Запись кэша
+# действительна, пока версии ее таблиц не изменились, поэтому изменения из
+# любого воркера сразу видны всем. Версии читаются до рендеринга: гонка с
+# параллельной записью дает лишний промах, но не устаревшую страницу.
+#
+# Кэш в памяти процесса, LRU с ограничением по размеру (CACHE_MAX_BYTES).
+
+
+class FragmentCache:
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (versions, html, size)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, versions):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, versions, html):
+        size = len(html.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+            self._entries[key] = (versions, html, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+
+    def drop_tables(self, tables):
+        # Освобождаем память от записей, которые уже не совпадут по версиям
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if any(name in tables for name, _ in entry[0])]
+            for key in stale:
+                self.size -= self._entries.pop(key)[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'evictions': self.evictions,
+            }
+
+
+def table_versions(tables):
+    # ((таблица, версия), ...) в порядке имен; используется и для ETag страниц (app/http_cache.py)
+    rows = dict(db.session.execute(
+        select(CacheVersion.name, CacheVersion.version).where(CacheVersion.name.in_(tables))
+    ).all())
+    return tuple((name, rows.get(name, 0)) for name in sorted(tables))
+
+
+def cached_fragment(tables, render):
+    """HTML фрагмента из кэша или render() (запрос к базе + render_template).
+
+        table = cache.cached_fragment(('part', 'supply'), lambda: render_template(...))
+    """
+    fragments = current_app.extensions.get('fragment_cache')
+    if fragments is None:
+        return Markup(render())
+    key = (request.endpoint, tuple(sorted(request.args.items(multi=True))))
+    versions = table_versions(tables)
+    html = fragments.get(key, versions)
+    if html is None:
+        html = render()
+        fragments.put(key, versions, html)
+    return Markup(html)
+
+
+def _bump(session, tables):
+    for name in sorted(tables):
+        result = session.execute(
+            update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            session.execute(insert(CacheVersion).values(name=name, version=1))
+
+
+def _mark(session, table_name):
+    if table_name != CacheVersion.__tablename__:
+        session.info.setdefault('cache_dirty', set()).add(table_name)
+
+
+def mark_written(session, *table_names):
+    # Для записей через session.connection() (слушатели after_flush): их не видят
+    # ни flush, ни do_orm_execute, таблицы отмечаем явно
+    for table_name in table_names:
+        _mark(session, table_name)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            _mark(session, table.name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk(orm_execute_state):
+    # Пакетные insert()/update()/delete() идут мимо flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and getattr(table, 'name', None):
+            _mark(orm_execute_state.session, table.name)
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_before_commit(session):
+    # Версии меняются в той же транзакции, что и данные. Строка версии таблицы
+    # общая для всех пишущих в нее транзакций, но блокируется только здесь,
+    # после всей остальной работы транзакции, и до коммита - параллельные
+    # записи в одну таблицу сериализуются лишь на время самого коммита, а
+    # записи в разные таблицы не мешают друг другу (строки берутся в порядке
+    # имен, без взаимных блокировок). При записях мастерской (единицы в
+    # секунду) это незаметно. Отдельная транзакция после коммита убрала бы
+    # ожидание, но открыла бы окно, когда новые данные уже видны, а кэш и ETag
+    # еще отдают старые страницы, а при падении процесса между коммитами
+    # версия не изменилась бы совсем.
+    session.flush()
+    tables = session.info.get('cache_dirty')
+    if tables:
+        _bump(session, tables)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    tables = session.info.pop('cache_dirty', None)
+    if tables and has_app_context():
+        fragments = current_app.extensions.get('fragment_cache')
+        if fragments is not None:
+            fragments.drop_tables(tables)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('cache_dirty', None)
+
+
+def init_app(app):
+    # Строки версий для всех таблиц заранее, чтобы после коммита хватало UPDATE
+    existing = set(db.session.scalars(select(CacheVersion.name)))
+    for name in db.metadata.tables:
+        if name not in existing and name != CacheVersion.__tablename__:
+            db.session.add(CacheVersion(name=name, version=0))
+    db.session.commit()
+    if app.config.get('CACHE_ENABLED', True):
+        app.extensions['fragment_cache'] = FragmentCache(app.config.get('CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+
+def cache_stats(app):
+    fragments = app.extensions.get('fragment_cache')
+    return fragments.stats() if fragments is not None else {'enabled': False}
@@ -0,0 +1,197 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, select, update, case, insert
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Part, CatalogItem
+
+# Каталог видов запчастей (catalog_item) со счетчиками stock (свободно на
+# складе) и reserved (установлено в заказы). Маршруты, меняющие запчасти,
+# оборачивают изменения в track_parts(): вклад затронутых запчастей в счетчики
+# считается до и после, разница применяется одним пакетным
+# INSERT ... ON CONFLICT (name) DO UPDATE SET stock = stock + delta в той же
+# транзакции (как счетчики админ-панели в app/dashboard.py).
+# `flask catalog reconcile` пересчитывает счетчики по таблице part.
+
+
+def _part_figures(part_ids):
+    # {название: [свободно, установлено]} для запчастей part_ids
+    figures = {}
+    part_ids = list(part_ids)
+    for start in range(0, len(part_ids), 500):
+        chunk = part_ids[start:start + 500]
+        rows = db.session.execute(
+            select(
+                Part.name,
+                func.sum(case((Part.work_order_id.is_(None), 1), else_=0)),
+                func.sum(case((Part.work_order_id.isnot(None), 1), else_=0)),
+            ).where(Part.part_id.in_(chunk)).group_by(Part.name)
+        ).all()
+        for name, free, attached in rows:
+            current = figures.setdefault(name, [0, 0])
+            current[0] += free or 0
+            current[1] += attached or 0
+    return figures
+
+
+def _create_item(name, stock=0, reserved=0):
+    # Параллельное создание того же вида: уникальность name, повторяем UPDATE
+    try:
+        with db.session.begin_nested():
+            db.session.add(CatalogItem(name=name, stock=stock, reserved=reserved))
+        return True
+    except IntegrityError:
+        return False
+
+
+def _is_initialized():
+    return db.session.query(CatalogItem.catalog_item_id).limit(1).first() is not None
+
+
+def _upsert_deltas(rows):
+    # INSERT ... ON CONFLICT (name) DO UPDATE для всех видов сразу (Postgres, SQLite)
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return False
+    stmt = dialect_insert(CatalogItem)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CatalogItem.name],
+        set_={'stock': CatalogItem.stock + stmt.excluded.stock,
+              'reserved': CatalogItem.reserved + stmt.excluded.reserved},
+    )
+    # executemany: запрос компилируется один раз, строки идут пакетами драйвера
+    db.session.execute(stmt, rows)
+    return True
+
+
+def apply_delta(deltas):
+    """Прибавляет к счетчикам {название: (stock, reserved)}; недостающие виды создаются.
+
+    Все виды обновляются одним пакетным запросом, поэтому импорт тысяч видов
+    не превращается в запрос на вид.
+    """
+    if not _is_initialized():
+        # Каталог еще не заполнен: строим его целиком, уже с текущими изменениями
+        db.session.flush()
+        reconcile()
+        return
+    # Порядок имен одинаков во всех транзакциях - без взаимных блокировок
+    rows = [
+        {'name': name, 'stock': stock, 'reserved': reserved}
+        for name, (stock, reserved) in sorted(deltas.items()) if stock or reserved
+    ]
+    if not rows or _upsert_deltas(rows):
+        return
+    for row in rows:
+        values = {'stock': CatalogItem.stock + row['stock'], 'reserved': CatalogItem.reserved + row['reserved']}
+        result = db.session.execute(
+            update(CatalogItem).where(CatalogItem.name == row['name']).values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0 and not _create_item(row['name'], row['stock'], row['reserved']):
+            db.session.execute(
+                update(CatalogItem).where(CatalogItem.name == row['name']).values(**values)
+                .execution_options(synchronize_session=False)
+            )
+
+
+class PartTracker:
+    """Пересчитывает вклад запчастей в счетчики каталога вокруг изменений:
+
+        with catalog.track_parts([part.part_id]):
+            part.work_order_id = None
+        db.session.commit()
+
+    Новые запчасти добавляются после вставки через add(ids).
+    Коммит остается за вызывающим кодом.
+    """
+
+    def __init__(self, part_ids):
+        self.part_ids = set(part_ids)
+        self.before = _part_figures(self.part_ids)
+
+    def add(self, part_ids):
+        self.part_ids.update(part_ids)
+
+    def apply(self):
+        db.session.flush()
+        after = _part_figures(self.part_ids)
+        deltas = {}
+        for name in set(self.before) | set(after):
+            old = self.before.get(name, (0, 0))
+            new = after.get(name, (0, 0))
+            deltas[name] = (new[0] - old[0], new[1] - old[1])
+        apply_delta(deltas)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.apply()
+        return False
+
+
+def track_parts(part_ids=()):
+    return PartTracker(part_ids)
+
+
+def compute_fresh():
+    rows = db.session.execute(
+        select(
+            Part.name,
+            func.sum(case((Part.work_order_id.is_(None), 1), else_=0)),
+            func.sum(case((Part.work_order_id.isnot(None), 1), else_=0)),
+        ).group_by(Part.name)
+    ).all()
+    return {name: (free or 0, attached or 0) for name, free, attached in rows}
+
+
+def reconcile():
+    """Приводит счетчики к фактическим данным; возвращает расхождения
+    [(название, (stock, reserved) в каталоге, фактически)]. Коммит за вызывающим."""
+    fresh = compute_fresh()
+    items = {item.name: item for item in CatalogItem.query.all()}
+    mismatches, missing = [], []
+    for name in sorted(set(fresh) | set(items)):
+        actual = fresh.get(name, (0, 0))
+        item = items.get(name)
+        cached = (item.stock, item.reserved) if item else None
+        if cached == actual:
+            continue
+        mismatches.append((name, cached, actual))
+        if item is None:
+            missing.append({'name': name, 'stock': actual[0], 'reserved': actual[1]})
+        else:
+            item.stock, item.reserved = actual
+    if missing:
+        db.session.execute(insert(CatalogItem), missing)
+    return mismatches
+
+
+def low_stock_count():
+    return db.session.query(func.count(CatalogItem.catalog_item_id))\
+        .filter(CatalogItem.stock < CatalogItem.min_stock).scalar() or 0
+
+
+catalog_cli = AppGroup('catalog', help='Каталог запчастей и остатки.')
+
+
+@catalog_cli.command('reconcile')
+@click.option('--check', is_flag=True, help='Только показать расхождения')
+def reconcile_command(check):
+    """Пересчитать счетчики каталога по запчастям склада."""
+    mismatches = reconcile()
+    for name, cached, actual in mismatches:
+        click.echo(f'{name}: в каталоге {cached}, фактически {actual}')
+    if check:
+        db.session.rollback()
+        if mismatches:
+            raise SystemExit(1)
+    else:
+        db.session.commit()
+    click.echo(f'Расхождений: {len(mismatches)}')
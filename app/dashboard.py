@@ -0,0 +1,255 @@
+from decimal import Decimal
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, update, desc
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Client, WorkOrder, Part, DashboardCounter, PartUsageCounter
+
+# Статистика админ-панели хранится в таблицах dashboard_counter и
+# part_usage_counter. Маршруты, меняющие заказы, оборачивают изменения в
+# track_orders(): вклад заказов в счетчики считается до и после изменения,
+# и разница применяется UPDATE ... SET value = value + delta в той же транзакции.
+# Таблицы заполняются при запуске приложения (init_app) или командой
+# `flask dashboard rebuild`; get_stats() только читает.
+
+ACTIVE_STATUSES = ('Принят', 'В ремонте', 'Ожидает запчасти')
+DONE_STATUS = 'Выдан'
+COUNTERS = ('total_clients', 'active_orders', 'completed_orders', 'work_revenue', 'parts_revenue')
+POPULAR_PARTS_LIMIT = 5
+
+
+def _order_figures(order_id):
+    # Вклад одного заказа в счетчики и в статистику установленных запчастей
+    counters, usage = {}, {}
+    if order_id is None:
+        return counters, usage
+    row = db.session.query(WorkOrder.status, WorkOrder.work_cost)\
+        .filter(WorkOrder.work_order_id == order_id).first()
+    if row is None:
+        return counters, usage
+
+    parts = db.session.query(Part.name, func.count(Part.part_id), func.sum(Part.price))\
+        .filter(Part.work_order_id == order_id).group_by(Part.name).all()
+    for name, units, _ in parts:
+        usage[name] = units
+
+    if row.status in ACTIVE_STATUSES:
+        counters['active_orders'] = 1
+    if row.status == DONE_STATUS:
+        counters['completed_orders'] = 1
+        counters['work_revenue'] = row.work_cost or Decimal('0.00')
+        counters['parts_revenue'] = sum((total or Decimal('0.00') for _, _, total in parts), Decimal('0.00'))
+    return counters, usage
+
+
+def _diff(before, after):
+    return {key: after.get(key, 0) - before.get(key, 0) for key in set(before) | set(after)}
+
+
+def _is_initialized():
+    return db.session.get(DashboardCounter, COUNTERS[0]) is not None
+
+
+def apply_delta(counters, usage=None):
+    # Пока таблицы не заполнены rebuild(), дельты не пишем: базы для них нет
+    counters = {name: delta for name, delta in counters.items() if delta}
+    usage = {name: delta for name, delta in (usage or {}).items() if delta}
+    if not (counters or usage) or not _is_initialized():
+        return
+
+    # Порядок имен одинаков во всех транзакциях - без взаимных блокировок
+    for name, delta in sorted(counters.items()):
+        db.session.execute(
+            update(DashboardCounter)
+            .where(DashboardCounter.name == name)
+            .values(value=DashboardCounter.value + delta)
+        )
+    rows = [{'name': name, 'units': delta} for name, delta in sorted(usage.items())]
+    if rows and not _upsert_usage(rows):
+        for row in rows:
+            _add_usage(row['name'], row['units'])
+
+
+def _upsert_usage(rows):
+    # INSERT ... ON CONFLICT (name) DO UPDATE: параллельная вставка того же
+    # названия не падает на первичном ключе (как catalog._upsert_deltas)
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return False
+    stmt = dialect_insert(PartUsageCounter)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PartUsageCounter.name],
+        set_={'units': PartUsageCounter.units + stmt.excluded.units},
+    )
+    db.session.execute(stmt, rows)
+    return True
+
+
+def _add_usage(name, delta):
+    # Другие СУБД: UPDATE, при отсутствии строки - вставка в точке сохранения
+    statement = update(PartUsageCounter).where(PartUsageCounter.name == name)\
+        .values(units=PartUsageCounter.units + delta).execution_options(synchronize_session=False)
+    if db.session.execute(statement).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(PartUsageCounter(name=name, units=delta))
+    except IntegrityError:
+        db.session.execute(statement)
+
+
+class OrderTracker:
+    """Пересчитывает вклад заказов в статистику вокруг изменений:
+
+        with dashboard.track_orders(order):
+            order.status = 'Выдан'
+        db.session.commit()
+
+    или явно, когда изменения разбросаны по коду маршрута:
+
+        tracker = dashboard.track_orders(order)
+        ...
+        tracker.apply()
+        db.session.commit()
+
+    Новые (без id) и удаленные заказы учитываются корректно.
+    Коммит остается за вызывающим кодом.
+    """
+
+    def __init__(self, orders):
+        self.orders = orders
+        self.before = [_order_figures(order.work_order_id) for order in orders]
+
+    def apply(self):
+        db.session.flush()
+        counters, usage = {}, {}
+        for order, (old_counters, old_usage) in zip(self.orders, self.before):
+            new_counters, new_usage = _order_figures(order.work_order_id)
+            for name, delta in _diff(old_counters, new_counters).items():
+                counters[name] = counters.get(name, 0) + delta
+            for name, delta in _diff(old_usage, new_usage).items():
+                usage[name] = usage.get(name, 0) + delta
+        apply_delta(counters, usage)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.apply()
+        return False
+
+
+def track_orders(*orders):
+    return OrderTracker(orders)
+
+
+def client_added():
+    apply_delta({'total_clients': 1})
+
+
+def client_removed():
+    apply_delta({'total_clients': -1})
+
+
+def compute_fresh():
+    # Полный пересчет по таблицам work_order и part (как раньше в admin_index)
+    work_revenue = db.session.query(func.sum(WorkOrder.work_cost))\
+        .filter(WorkOrder.status == DONE_STATUS).scalar() or Decimal('0.00')
+    parts_revenue = db.session.query(func.sum(Part.price))\
+        .join(WorkOrder).filter(WorkOrder.status == DONE_STATUS).scalar() or Decimal('0.00')
+    counters = {
+        'total_clients': Client.query.count(),
+        'active_orders': WorkOrder.query.filter(WorkOrder.status.in_(ACTIVE_STATUSES)).count(),
+        'completed_orders': WorkOrder.query.filter_by(status=DONE_STATUS).count(),
+        'work_revenue': work_revenue,
+        'parts_revenue': parts_revenue,
+    }
+    usage = dict(
+        db.session.query(Part.name, func.count(Part.part_id))
+        .filter(Part.work_order_id.isnot(None)).group_by(Part.name).all()
+    )
+    return counters, usage
+
+
+def rebuild():
+    counters, usage = compute_fresh()
+    DashboardCounter.query.delete()
+    PartUsageCounter.query.delete()
+    db.session.add_all(DashboardCounter(name=name, value=value) for name, value in counters.items())
+    db.session.add_all(PartUsageCounter(name=name, units=units) for name, units in usage.items())
+    db.session.commit()
+
+
+def get_stats():
+    # Только чтение готовых счетчиков: два запроса к маленьким таблицам.
+    # Незаполненные таблицы (init_app еще не отработал) - пересчет без записи.
+    if not _is_initialized():
+        counters, usage = compute_fresh()
+        popular_parts = sorted(((name, units) for name, units in usage.items() if units > 0),
+                               key=lambda item: (-item[1], item[0]))[:POPULAR_PARTS_LIMIT]
+    else:
+        counters = {row.name: row.value for row in DashboardCounter.query.all()}
+        popular_parts = db.session.query(PartUsageCounter.name, PartUsageCounter.units)\
+            .filter(PartUsageCounter.units > 0)\
+            .order_by(desc(PartUsageCounter.units), PartUsageCounter.name).limit(POPULAR_PARTS_LIMIT).all()
+    return {
+        'total_clients': int(counters.get('total_clients', 0)),
+        'active_orders': int(counters.get('active_orders', 0)),
+        'completed_orders': int(counters.get('completed_orders', 0)),
+        'revenue': counters.get('work_revenue', Decimal('0.00')) + counters.get('parts_revenue', Decimal('0.00')),
+        'popular_parts': popular_parts,
+    }
+
+
+def init_app(app):
+    # Первое заполнение счетчиков при запуске, а не из GET /admin/
+    if _is_initialized():
+        return
+    try:
+        rebuild()
+    except IntegrityError:
+        # Другой процесс заполнил таблицы одновременно с нами
+        db.session.rollback()
+
+
+def check_consistency():
+    # Список расхождений (имя, в кэше, фактически); пустой - все сходится
+    cached_counters = {row.name: row.value for row in DashboardCounter.query.all()}
+    cached_usage = {row.name: row.units for row in PartUsageCounter.query.filter(PartUsageCounter.units != 0)}
+    fresh_counters, fresh_usage = compute_fresh()
+
+    mismatches = []
+    for name in COUNTERS:
+        if Decimal(cached_counters.get(name, 0)) != Decimal(fresh_counters[name]):
+            mismatches.append((name, cached_counters.get(name), fresh_counters[name]))
+    for name in sorted(set(cached_usage) | set(fresh_usage)):
+        if cached_usage.get(name, 0) != fresh_usage.get(name, 0):
+            mismatches.append((f'part:{name}', cached_usage.get(name, 0), fresh_usage.get(name, 0)))
+    return mismatches
+
+
+dashboard_cli = AppGroup('dashboard', help='Статистика админ-панели.')
+
+
+@dashboard_cli.command('rebuild')
+def rebuild_command():
+    """Полностью пересчитать счетчики."""
+    rebuild()
+    click.echo('Статистика пересчитана.')
+
+
+@dashboard_cli.command('check')
+def check_command():
+    """Сравнить счетчики с фактическими данными."""
+    mismatches = check_consistency()
+    for name, cached, fresh in mismatches:
+        click.echo(f'{name}: в счетчиках {cached}, фактически {fresh}')
+    if mismatches:
+        raise SystemExit(1)
+    click.echo('Расхождений нет.')
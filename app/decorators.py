@@ -1,10 +1,13 @@
 from functools import wraps
-from flask import session, flash, redirect, url_for
+from flask import flash, redirect, url_for
+from app.sessions import get_current_user
+
+# Пользователь берется из серверной сессии (app/sessions.py) без запросов к базе
 
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if get_current_user() is None:
             flash('Войдите в систему', 'warning')
             return redirect(url_for('auth_bp.login'))
         return f(*args, **kwargs)
@@ -13,8 +16,9 @@ def login_required(f):
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if session.get('role') != 'admin':
+        user = get_current_user()
+        if user is None or user.role != 'admin':
             flash('Доступ запрещён', 'danger')
             return redirect(url_for('main_bp.index'))
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
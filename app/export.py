@@ -0,0 +1,58 @@
+import csv
+import io
+from datetime import date, datetime
+from flask import Response, stream_with_context
+from app import db
+
+# Выгрузки CSV для бухгалтерии. Запрос выполняется с yield_per (на Postgres это
+# серверный курсор), строки форматируются и отдаются клиенту порциями, поэтому
+# память процесса не зависит от размера выгрузки. Формат рассчитан на Excel с
+# русской локалью: UTF-8 с BOM и разделитель ";".
+
+YIELD_PER = 1000
+CHUNK_ROWS = 500
+DELIMITER = ';'
+
+
+def _value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(header, stmt):
+    # Заголовок уходит сразу, чтобы первый байт не ждал выполнения запроса
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=DELIMITER)
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    rows = db.session.execute(stmt, execution_options={'yield_per': YIELD_PER})
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_value(value) for value in row])
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def csv_response(name, header, stmt):
+    """Потоковый ответ с выгрузкой stmt (select колонок, порядок как в header)."""
+    filename = f'{name}-{date.today().isoformat()}.csv'
+    return Response(
+        stream_with_context(stream_csv(header, stmt)),
+        content_type='text/csv; charset=utf-8',
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            # Не буферизовать ответ на прокси (nginx)
+            'X-Accel-Buffering': 'no',
+        },
+    )
@@ -0,0 +1,176 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from collections import namedtuple
+from datetime import date
+from functools import wraps
+from flask import request, session, current_app, url_for, abort, make_response
+from app import cache
+from app.sessions import get_current_user
+
+try:
+    import brotli
+except ImportError:  # Brotli - необязательная возможность, без него только gzip
+    brotli = None
+
+# HTTP-кэширование.
+#
+# Страницы: представление с @conditional_get(tables) отдает слабый ETag из
+# версий таблиц (cache_version, см. app/cache.py), параметров запроса,
+# текущего пользователя и даты. Если браузер прислал тот же If-None-Match,
+# ответ 304 уходит после одного запроса версий, без выборки строк и
+# рендеринга. Версии читаются до рендеринга: параллельная запись дает лишний
+# полный ответ, но не устаревший 304. Last-Modified не выставляется: в
+# таблицах нет времени изменения строк, а счетчик версий точнее.
+#
+# Статика: при запуске файлы из app/static хэшируются и сжимаются (gzip и,
+# если установлен brotli, br) в памяти процесса. asset_url('css/style.css')
+# дает /assets/css/style.<хэш>.css; такой URL меняется вместе с содержимым,
+# поэтому отдается с Cache-Control: immutable на год.
+
+ASSET_MAX_AGE = 365 * 24 * 3600
+ASSET_HASH_LENGTH = 12
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html'}
+# Сжатые варианты, которые не меньше исходника хотя бы на 5%, не храним
+MIN_SAVING = 0.95
+
+Asset = namedtuple('Asset', 'name fingerprinted mimetype etag variants')  # variants: {кодировка: bytes}
+
+
+def _fingerprinted_name(name, digest):
+    root, ext = os.path.splitext(name)
+    return f'{root}.{digest[:ASSET_HASH_LENGTH]}{ext}'
+
+
+def build_assets(static_folder):
+    """Хэширует и сжимает файлы статики; возвращает {имя: Asset}."""
+    assets = {}
+    for directory, _, files in os.walk(static_folder):
+        for filename in sorted(files):
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            variants = {'identity': data}
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE:
+                compressed = {'gzip': gzip.compress(data, 9, mtime=0)}
+                if brotli is not None:
+                    compressed['br'] = brotli.compress(data, quality=11)
+                for encoding, body in compressed.items():
+                    if len(body) < len(data) * MIN_SAVING:
+                        variants[encoding] = body
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            assets[name] = Asset(name, _fingerprinted_name(name, digest), mimetype,
+                                 digest[:32], variants)
+    return assets
+
+
+def asset_url(filename):
+    """url_for для статики: адрес с хэшем содержимого или обычный /static/."""
+    fingerprinted = current_app.extensions.get('assets', {}).get('urls', {}).get(filename)
+    if fingerprinted is None:
+        return url_for('static', filename=filename)
+    return url_for('asset', filename=fingerprinted)
+
+
+def _choose_encoding(asset):
+    accepted = request.accept_encodings
+    for encoding in ('br', 'gzip'):
+        if encoding in asset.variants and accepted[encoding]:
+            return encoding
+    return 'identity'
+
+
+def serve_asset(filename):
+    registry = current_app.extensions['assets']
+    asset = registry['by_url'].get(filename)
+    immutable = asset is not None
+    if asset is None:
+        # Адрес со старым хэшем (страница из прошлой версии): отдаем текущий файл без долгого кэша
+        name = re.sub(r'\.[0-9a-f]{%d}(\.[^./]+)$' % ASSET_HASH_LENGTH, r'\1', filename)
+        asset = registry['assets'].get(name) if name != filename else None
+        if asset is None:
+            abort(404)
+
+    encoding = _choose_encoding(asset)
+    response = make_response(asset.variants[encoding])
+    response.mimetype = asset.mimetype
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(f'{asset.etag}-{encoding}')
+    if immutable:
+        response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+def _templates_digest(app):
+    # Меняется при выкладке новых шаблонов, чтобы старые ETag страниц не совпали
+    digest = hashlib.sha256()
+    folder = os.path.join(app.root_path, app.template_folder)
+    for directory, _, files in sorted(os.walk(folder)):
+        for filename in sorted(files):
+            with open(os.path.join(directory, filename), 'rb') as f:
+                digest.update(filename.encode('utf-8') + f.read())
+    return digest.hexdigest()
+
+
+def _page_etag(tables):
+    user = get_current_user()
+    key = (
+        current_app.secret_key,
+        current_app.extensions['http_cache_build'],
+        request.endpoint,
+        tuple(sorted((request.view_args or {}).items())),
+        tuple(sorted(request.args.items(multi=True))),
+        tuple(user) if user else None,
+        date.today().isoformat(),
+        cache.table_versions(tables),
+    )
+    return hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:32]
+
+
+def conditional_get(tables):
+    """ETag страницы по версиям таблиц tables; совпавший If-None-Match - 304 без рендеринга.
+
+        @conditional_get(('part', 'supply', 'supplier'))
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Непоказанные flash-сообщения выводит только полный рендер
+            if (request.method not in ('GET', 'HEAD') or '_flashes' in session
+                    or not current_app.config.get('HTTP_ETAGS_ENABLED', True)):
+                return f(*args, **kwargs)
+            etag = _page_etag(tables)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            # Страница своя у каждого пользователя и проверяется при каждом показе
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return decorated_function
+    return decorator
+
+
+def init_app(app):
+    app.extensions['http_cache_build'] = _templates_digest(app)
+    if app.config.get('ASSETS_FINGERPRINT', True):
+        assets = build_assets(app.static_folder)
+        app.extensions['assets'] = {
+            'assets': assets,
+            'urls': {name: asset.fingerprinted for name, asset in assets.items()},
+            'by_url': {asset.fingerprinted: asset for asset in assets.values()},
+        }
+        app.add_url_rule('/assets/<path:filename>', endpoint='asset', view_func=serve_asset)
+    app.jinja_env.globals['asset_url'] = asset_url
@@ -0,0 +1,244 @@
+import csv
+import io
+import os
+from collections import Counter
+from datetime import datetime, date
+from decimal import Decimal, InvalidOperation
+import click
+from flask.cli import AppGroup
+from sqlalchemy import insert
+from app import db
+from app.models import Part, Supply, Supplier
+from app import search
+from app import catalog
+
+try:
+    import openpyxl
+except ImportError:  # XLSX - необязательная возможность
+    openpyxl = None
+
+# Импорт накладных поставщиков: файл читается построчно, строки проверяются
+# и вставляются пакетами (INSERT ... VALUES на BATCH_SIZE строк), поэтому
+# память не зависит от размера файла. Строки одной даты одного поставщика
+# попадают в одну поставку. Ошибочные строки пропускаются и попадают в отчет.
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 200
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y')
+
+# Допустимые заголовки колонок -> поле
+COLUMNS = {
+    'supplier': 'supplier', 'поставщик': 'supplier',
+    'supply_date': 'supply_date', 'date': 'supply_date', 'дата': 'supply_date', 'дата поставки': 'supply_date',
+    'part_name': 'part_name', 'name': 'part_name', 'название': 'part_name', 'запчасть': 'part_name',
+    'price': 'price', 'цена': 'price',
+}
+REQUIRED = ('supplier', 'supply_date', 'part_name', 'price')
+
+
+class ImportFileError(Exception):
+    # Файл нельзя разобрать целиком (нет нужных колонок, неизвестный формат)
+    pass
+
+
+class ImportResult:
+
+    def __init__(self):
+        self.rows_total = 0
+        self.parts_created = 0
+        self.supplies_created = 0
+        self.error_count = 0
+        self.errors = []  # (номер строки, сообщение), не больше MAX_REPORTED_ERRORS
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def _header_map(header):
+    mapping = {}
+    for index, title in enumerate(header):
+        field = COLUMNS.get(str(title or '').strip().lower())
+        if field:
+            mapping[field] = index
+    missing = [field for field in REQUIRED if field not in mapping]
+    if missing:
+        raise ImportFileError('В файле нет колонок: ' + ', '.join(missing))
+    return mapping
+
+
+def _records(rows):
+    # Строки файла -> (номер строки, dict полей); первая строка - заголовок
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise ImportFileError('Файл пуст')
+    mapping = _header_map(header)
+    for line, row in enumerate(rows, start=2):
+        if not any(cell not in (None, '') for cell in row):
+            continue
+        yield line, {field: (row[index] if index < len(row) else None) for field, index in mapping.items()}
+
+
+def read_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    sample = text.readline()
+    dialect = csv.Sniffer().sniff(sample, delimiters=',;\t') if sample.strip() else csv.excel
+    return csv.reader(_prepend(sample, text), dialect)
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+def read_xlsx(stream):
+    if openpyxl is None:
+        raise ImportFileError('Для XLSX нужен пакет openpyxl')
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    return workbook.active.iter_rows(values_only=True)
+
+
+def read_rows(stream, filename):
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.xlsx':
+        return read_xlsx(stream)
+    if extension in ('.csv', '.txt', ''):
+        return read_csv(stream)
+    raise ImportFileError(f'Неподдерживаемый формат файла: {extension}')
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value or '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f'неверная дата "{value}"')
+
+
+def _parse_price(value):
+    try:
+        price = Decimal(str(value).strip().replace(' ', '').replace(',', '.'))
+    except (InvalidOperation, AttributeError):
+        raise ValueError(f'неверная цена "{value}"')
+    if price < 0 or not price.is_finite():
+        raise ValueError(f'неверная цена "{value}"')
+    return price.quantize(Decimal('0.01'))
+
+
+class _SupplyImporter:
+
+    def __init__(self, result):
+        self.result = result
+        self.supplier_ids = {}
+        self.supply_ids = {}
+        self.batch = []
+
+    def supplier_id(self, name):
+        if name not in self.supplier_ids:
+            self.supplier_ids[name] = db.session.query(Supplier.supplier_id).filter(Supplier.name == name).scalar()
+        return self.supplier_ids[name]
+
+    def supply_id(self, supplier_id, supply_date):
+        key = (supplier_id, supply_date)
+        if key not in self.supply_ids:
+            supply = Supply(supplier_id=supplier_id, supply_date=supply_date)
+            db.session.add(supply)
+            db.session.flush()
+            self.supply_ids[key] = supply.supply_id
+            self.result.supplies_created += 1
+        return self.supply_ids[key]
+
+    def add(self, line, record):
+        supplier_name = str(record['supplier'] or '').strip()
+        part_name = str(record['part_name'] or '').strip()
+        if not supplier_name:
+            raise ValueError('не указан поставщик')
+        if not part_name:
+            raise ValueError('не указано название запчасти')
+        if len(part_name) > 100:
+            raise ValueError('название длиннее 100 символов')
+        supply_date = _parse_date(record['supply_date'])
+        price = _parse_price(record['price'])
+        supplier_id = self.supplier_id(supplier_name)
+        if supplier_id is None:
+            raise ValueError(f'поставщик "{supplier_name}" не найден')
+
+        self.batch.append({
+            'name': part_name,
+            'price': price,
+            'supply_id': self.supply_id(supplier_id, supply_date),
+            'work_order_id': None,
+        })
+        if len(self.batch) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        part_ids = db.session.scalars(insert(Part).returning(Part.part_id), self.batch).all()
+        # Вставка в обход ORM: карточки общего поиска пишем сами
+        search.index_objects('parts', [
+            Part(part_id=part_id, **row) for part_id, row in zip(part_ids, self.batch)
+        ])
+        # Все новые запчасти свободны: прибавляем к остаткам каталога
+        stock = Counter(row['name'] for row in self.batch)
+        catalog.apply_delta({name: (units, 0) for name, units in stock.items()})
+        self.result.parts_created += len(part_ids)
+        self.batch = []
+
+
+def import_supplies(rows, dry_run=False):
+    """Импорт строк (итератор списков значений, первая - заголовок).
+
+    Все выполняется в одной транзакции; при dry_run изменения откатываются,
+    остается только отчет о проверке.
+    """
+    result = ImportResult()
+    importer = _SupplyImporter(result)
+    try:
+        for line, record in _records(rows):
+            result.rows_total += 1
+            try:
+                importer.add(line, record)
+            except ValueError as e:
+                result.add_error(line, str(e))
+        importer.flush()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    return result
+
+
+supplies_cli = AppGroup('supplies', help='Поставки и склад.')
+
+
+@supplies_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Только проверить файл, ничего не сохранять.')
+def import_command(path, dry_run):
+    """Импорт накладной из CSV/XLSX (колонки: supplier, supply_date, part_name, price)."""
+    with open(path, 'rb') as stream:
+        try:
+            result = import_supplies(read_rows(stream, path), dry_run=dry_run)
+        except ImportFileError as e:
+            raise click.ClickException(str(e))
+    for line, message in result.errors:
+        click.echo(f'строка {line}: {message}')
+    if result.error_count > len(result.errors):
+        click.echo(f'... и еще {result.error_count - len(result.errors)} ошибок')
+    action = 'проверено' if dry_run else 'импортировано'
+    click.echo(f'Строк: {result.rows_total}, {action} запчастей: {result.parts_created}, '
+               f'поставок: {result.supplies_created}, ошибок: {result.error_count}')
@@ -0,0 +1,235 @@
+import json
+import os
+import random
+import signal
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, update, delete, func
+from app import db
+from app.models import Job
+from app.profiler import percentile
+
+# Фоновые задачи. Очередь - таблица job в основной базе: enqueue() добавляет
+# строку в текущую транзакцию, поэтому задача появляется в очереди только
+# вместе с изменениями, которые ее вызвали (и пропадает при откате).
+# Воркер (`flask jobs worker`) забирает готовые задачи по одной
+# (SELECT ... FOR UPDATE SKIP LOCKED на Postgres, условный UPDATE везде),
+# выполняет обработчик и при ошибке откладывает повтор с растущей паузой.
+# Доставка "хотя бы один раз": если воркер упадет после обработчика, задача
+# выполнится повторно, поэтому обработчики должны быть идемпотентными.
+
+TASKS = {}
+RECENT_WINDOW = 500
+RECLAIM_INTERVAL = 60
+
+
+def task(name):
+    """Регистрирует обработчик задачи:
+
+        @jobs.task('notify_order_ready')
+        def notify_order_ready(order_id):
+            ...
+    """
+    def decorator(handler):
+        TASKS[name] = handler
+        return handler
+    return decorator
+
+
+def enqueue(name, delay=0, **payload):
+    """Ставит задачу в очередь; коммит за вызывающим. payload - JSON-совместимые значения."""
+    if name not in TASKS:
+        raise KeyError(f'Неизвестная задача: {name}')
+    now = datetime.utcnow()
+    job = Job(
+        name=name,
+        payload=json.dumps(payload, ensure_ascii=False),
+        status='pending',
+        attempts=0,
+        max_attempts=current_app.config.get('JOBS_MAX_ATTEMPTS', 5),
+        run_at=now + timedelta(seconds=delay),
+        created_at=now,
+    )
+    db.session.add(job)
+    return job
+
+
+def backoff(attempts):
+    config = current_app.config
+    delay = min(config.get('JOBS_BACKOFF_SECONDS', 10) * 2 ** (attempts - 1), config.get('JOBS_BACKOFF_MAX', 3600))
+    # Разброс, чтобы повторы после общего сбоя не приходили разом
+    return delay * random.uniform(1.0, 1.1)
+
+
+def claim(worker_id):
+    """Забирает одну готовую задачу (status running) или возвращает None."""
+    for _ in range(3):
+        now = datetime.utcnow()
+        job_id = db.session.execute(
+            select(Job.job_id)
+            .where(Job.status == 'pending', Job.run_at <= now)
+            .order_by(Job.run_at, Job.job_id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar()
+        if job_id is None:
+            db.session.rollback()
+            return None
+        # Условие на status - для СУБД без блокировок строк
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.job_id == job_id, Job.status == 'pending')
+            .values(status='running', attempts=Job.attempts + 1, started_at=now, worker=worker_id)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+    return None
+
+
+def run_job(job):
+    """Выполняет задачу и записывает результат; возвращает True при успехе."""
+    job_id, name, attempts, max_attempts = job.job_id, job.name, job.attempts, job.max_attempts
+    try:
+        handler = TASKS.get(name)
+        if handler is None:
+            raise LookupError(f'Неизвестная задача: {name}')
+        handler(**json.loads(job.payload))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc()[-2000:]
+        now = datetime.utcnow()
+        if attempts >= max_attempts:
+            values = {'status': 'failed', 'finished_at': now, 'last_error': error}
+            current_app.logger.error('Задача %s #%s не выполнена после %s попыток', name, job_id, attempts)
+        else:
+            values = {'status': 'pending', 'run_at': now + timedelta(seconds=backoff(attempts)), 'last_error': error}
+            current_app.logger.warning('Задача %s #%s: ошибка, попытка %s из %s', name, job_id, attempts, max_attempts)
+        db.session.execute(update(Job).where(Job.job_id == job_id).values(**values))
+        db.session.commit()
+        return False
+
+    db.session.execute(
+        update(Job).where(Job.job_id == job_id)
+        .values(status='done', finished_at=datetime.utcnow(), last_error=None)
+    )
+    db.session.commit()
+    return True
+
+
+def reclaim_stale():
+    """Возвращает в очередь задачи воркеров, которые не отчитались за JOBS_STALE_AFTER."""
+    now = datetime.utcnow()
+    stale = Job.status == 'running', Job.started_at < now - timedelta(seconds=current_app.config.get('JOBS_STALE_AFTER', 600))
+    failed = db.session.execute(
+        update(Job).where(*stale, Job.attempts >= Job.max_attempts)
+        .values(status='failed', finished_at=now, last_error='Воркер не завершил задачу')
+    ).rowcount
+    requeued = db.session.execute(
+        update(Job).where(*stale).values(status='pending', run_at=now, last_error='Воркер не завершил задачу')
+    ).rowcount
+    db.session.commit()
+    return requeued, failed
+
+
+def work(once=False, worker_id=None, max_jobs=None):
+    """Цикл воркера. once - выполнить готовые задачи и выйти. Возвращает число выполненных задач."""
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+    poll = current_app.config.get('JOBS_POLL_INTERVAL', 1)
+    stopping = []
+
+    def stop(signum, frame):
+        # Текущая задача дорабатывается, новые не берутся
+        stopping.append(signum)
+
+    previous = {sig: signal.signal(sig, stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+    processed, last_reclaim = 0, 0.0
+    try:
+        while not stopping and (max_jobs is None or processed < max_jobs):
+            if time.monotonic() - last_reclaim >= RECLAIM_INTERVAL:
+                reclaim_stale()
+                last_reclaim = time.monotonic()
+            job = claim(worker_id)
+            if job is None:
+                if once:
+                    break
+                time.sleep(poll)
+                continue
+            run_job(job)
+            processed += 1
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+    return processed
+
+
+def stats():
+    """Глубина очереди и задержки задач (для /admin/_jobs)."""
+    now = datetime.utcnow()
+    counts = dict(db.session.query(Job.status, func.count()).group_by(Job.status).all())
+    due, oldest_due = db.session.query(func.count(), func.min(Job.run_at))\
+        .filter(Job.status == 'pending', Job.run_at <= now).one()
+    recent = db.session.query(Job.created_at, Job.started_at, Job.finished_at)\
+        .filter(Job.status == 'done', Job.finished_at.isnot(None))\
+        .order_by(Job.finished_at.desc()).limit(RECENT_WINDOW).all()
+    wait = [(started - created).total_seconds() * 1000 for created, started, _ in recent]
+    run = [(finished - started).total_seconds() * 1000 for _, started, finished in recent]
+    return {
+        'pending': counts.get('pending', 0),
+        'due': due,
+        'oldest_due_s': round((now - oldest_due).total_seconds(), 1) if oldest_due else 0.0,
+        'running': counts.get('running', 0),
+        'done': counts.get('done', 0),
+        'failed': counts.get('failed', 0),
+        'recent': len(recent),
+        'wait_p50_ms': round(percentile(wait, 0.5), 1),
+        'wait_p95_ms': round(percentile(wait, 0.95), 1),
+        'run_p50_ms': round(percentile(run, 0.5), 1),
+        'run_p95_ms': round(percentile(run, 0.95), 1),
+    }
+
+
+jobs_cli = AppGroup('jobs', help='Фоновые задачи.')
+
+
+@jobs_cli.command('worker')
+@click.option('--once', is_flag=True, help='Выполнить готовые задачи и выйти')
+def worker_command(once):
+    """Запустить воркер фоновых задач."""
+    processed = work(once=once)
+    click.echo(f'Выполнено задач: {processed}')
+
+
+@jobs_cli.command('stats')
+def stats_command():
+    """Показать состояние очереди."""
+    for key, value in stats().items():
+        click.echo(f'{key}: {value}')
+
+
+@jobs_cli.command('retry-failed')
+def retry_failed_command():
+    """Вернуть в очередь задачи, исчерпавшие попытки."""
+    count = db.session.execute(
+        update(Job).where(Job.status == 'failed')
+        .values(status='pending', attempts=0, run_at=datetime.utcnow(), finished_at=None)
+    ).rowcount
+    db.session.commit()
+    click.echo(f'Возвращено в очередь: {count}')
+
+
+@jobs_cli.command('purge')
+@click.option('--days', default=7, show_default=True, help='Удалить выполненные задачи старше N дней')
+def purge_command(days):
+    """Удалить старые выполненные задачи."""
+    count = db.session.execute(
+        delete(Job).where(Job.status == 'done', Job.finished_at < datetime.utcnow() - timedelta(days=days))
+    ).rowcount
+    db.session.commit()
+    click.echo(f'Удалено: {count}')
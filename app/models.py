@@ -1,8 +1,9 @@
 from app import db
+from app import passwords
 from datetime import datetime
 from decimal import Decimal
-from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import func
+from sqlalchemy.orm import configure_mappers
 import os
 
 
@@ -19,6 +20,10 @@ class Role(db.Model):
     
 class User(db.Model):
     __tablename__ = 'user_account'
+    __table_args__ = (
+        # ключ курсорной пагинации списка пользователей
+        db.Index('ix_user_account_created', 'created_at', 'user_account_id'),
+    )
     user_account_id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(256), nullable=False)
@@ -28,10 +33,14 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = passwords.hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password, password)
+        return passwords.verify(self.password, password)
+
+    def password_needs_rehash(self):
+        # Хэш создан с другими параметрами, чем PASSWORD_HASH_METHOD
+        return passwords.needs_rehash(self.password)
 
 
     @property
@@ -49,13 +58,17 @@ class User(db.Model):
 
 class Client(db.Model):
     __tablename__ = 'client'
+    __table_args__ = (
+        # сортировка в автодополнении формы заказа
+        db.Index('ix_client_last_name', 'last_name', 'client_id'),
+    )
     client_id = db.Column(db.Integer, primary_key=True)
     last_name = db.Column(db.String(50), nullable=False)
     first_name = db.Column(db.String(50), nullable=False)
     middle_name = db.Column(db.String(50))
     phone = db.Column(db.String(20), index=True, unique=True)
 
-    orders = db.relationship('WorkOrder', backref='client', lazy='dynamic')
+    orders = db.relationship('WorkOrder', backref='client', lazy=True)
     user = db.relationship('User', backref='client', uselist=False, lazy=True)
 
     @property
@@ -65,6 +78,13 @@ class Client(db.Model):
 
 class WorkOrder(db.Model):
     __tablename__ = 'work_order'
+    __table_args__ = (
+        # ключи курсорной пагинации: все заказы и история заказов клиента
+        db.Index('ix_work_order_received', 'received_date', 'work_order_id'),
+        db.Index('ix_work_order_client_received', 'client_id', 'received_date', 'work_order_id'),
+        # пересчет сводок по дням завершения (app/reports.py)
+        db.Index('ix_work_order_completion', 'completion_date'),
+    )
     work_order_id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey('client.client_id'), nullable=False, index=True)
     phone_model = db.Column(db.String(100), nullable=False)
@@ -78,8 +98,10 @@ class WorkOrder(db.Model):
 
     @property
     def total_parts_cost(self):
-        total = db.session.query(func.sum(Part.price)).filter(Part.work_order_id == self.work_order_id).scalar()
-        return total or Decimal('0.00')
+        # parts_total - отложенная колонка-подзапрос (см. ниже после Part):
+        # в списках подгружается вместе с заказами через undefer(),
+        # на странице одного заказа догружается отдельным запросом при обращении
+        return self.parts_total or Decimal('0.00')
 
     @property
     def total_cost(self):
@@ -92,6 +114,13 @@ class WorkOrder(db.Model):
  
 class Part(db.Model):
     __tablename__ = 'part'
+    __table_args__ = (
+        db.Index('ix_part_name', 'name', 'part_id'),
+        # свободные экземпляры вида по поставкам: выбор FIFO (app/allocation.py)
+        db.Index('ix_part_free_name_supply', 'name', 'supply_id',
+                 postgresql_where=db.text('work_order_id IS NULL'),
+                 sqlite_where=db.text('work_order_id IS NULL')),
+    )
     part_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     price = db.Column(db.Numeric(10, 2), nullable=False)
@@ -99,13 +128,60 @@ class Part(db.Model):
     work_order_id = db.Column(db.Integer, db.ForeignKey('work_order.work_order_id'), nullable=True, index=True)
 
 
+class CatalogItem(db.Model):
+    # Вид запчасти в каталоге. Экземпляры (Part) связаны с ним по названию;
+    # stock - свободные на складе, reserved - установленные в заказы.
+    # Счетчики ведет app/catalog.py в тех же транзакциях, что меняют запчасти.
+    __tablename__ = 'catalog_item'
+    catalog_item_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    sku = db.Column(db.String(50), unique=True)
+    stock = db.Column(db.Integer, nullable=False, default=0)
+    reserved = db.Column(db.Integer, nullable=False, default=0)
+    min_stock = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def is_low(self):
+        return self.stock < self.min_stock
+
+
+Part.catalog_item = db.relationship(
+    CatalogItem,
+    primaryjoin=db.foreign(Part.name) == CatalogItem.name,
+    viewonly=True,
+)
+
+
+# Сумма запчастей заказа одним коррелированным подзапросом.
+# Объявлена после Part, т.к. ссылается на его колонки.
+WorkOrder.parts_total = db.column_property(
+    db.select(func.coalesce(func.sum(Part.price), 0))
+    .where(Part.work_order_id == WorkOrder.work_order_id)
+    .correlate_except(Part)
+    .scalar_subquery(),
+    deferred=True,
+)
+
+# Количество заказов клиента для списка клиентов (без загрузки самих заказов)
+Client.orders_count = db.column_property(
+    db.select(func.count(WorkOrder.work_order_id))
+    .where(WorkOrder.client_id == Client.client_id)
+    .correlate_except(WorkOrder)
+    .scalar_subquery(),
+    deferred=True,
+)
+
+
 class Supply(db.Model):
     __tablename__ = 'supply'
+    __table_args__ = (
+        db.Index('ix_supply_date', 'supply_date', 'supply_id'),
+    )
     supply_id = db.Column(db.Integer, primary_key=True)
     supply_date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
     supplier_id = db.Column(db.Integer, db.ForeignKey('supplier.supplier_id'), nullable=False, index=True)
 
-    parts = db.relationship('Part', backref='supply', lazy='dynamic')
+    parts = db.relationship('Part', backref='supply', lazy=True)
     
 
 class Supplier(db.Model):
@@ -114,7 +190,127 @@ class Supplier(db.Model):
     name = db.Column(db.String(100), nullable=False, unique=True)
     contacts = db.Column(db.Text)
 
-    supplies = db.relationship('Supply', backref='supplier', lazy='dynamic')
+    supplies = db.relationship('Supply', backref='supplier', lazy=True)
+
+class DashboardCounter(db.Model):
+    # Сводные счетчики админ-панели (клиенты, заказы, выручка), обновляются дельтами
+    __tablename__ = 'dashboard_counter'
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Numeric(14, 2), nullable=False, default=Decimal('0.00'))
+
+
+class PartUsageCounter(db.Model):
+    # Сколько запчастей каждого названия установлено в заказы
+    __tablename__ = 'part_usage_counter'
+    name = db.Column(db.String(100), primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0, index=True)
+
+
+class SearchDocument(db.Model):
+    # Карточка объекта в общем поиске (заголовок и подпись для выдачи)
+    __tablename__ = 'search_document'
+    entity = db.Column(db.String(20), primary_key=True)
+    entity_id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(255), nullable=False)
+    subtitle = db.Column(db.String(255))
+
+
+class SearchToken(db.Model):
+    # Слова объекта для поиска по префиксу; PK служит индексом (entity, token, entity_id)
+    __tablename__ = 'search_token'
+    __table_args__ = (
+        db.Index('ix_search_token_entity_id', 'entity', 'entity_id'),
+        # Postgres: LIKE 'слово%' по индексу при любой сортировке базы (см. app/search.py)
+        db.Index('ix_search_token_prefix', 'entity', 'token',
+                 postgresql_ops={'token': 'text_pattern_ops'}).ddl_if(dialect='postgresql'),
+    )
+    entity = db.Column(db.String(20), primary_key=True)
+    token = db.Column(db.String(100), primary_key=True)
+    entity_id = db.Column(db.Integer, primary_key=True)
+
+
+class OrderStatusChange(db.Model):
+    # Журнал смены статусов заказов (только добавление, см. app/status_history.py).
+    # dwell_seconds - сколько заказ пробыл в from_status, week - понедельник недели
+    # changed_at: считаются при записи, чтобы отчеты были простыми GROUP BY по индексам.
+    # Ссылка на заказ без внешнего ключа: история удаленных заказов остается в отчетах.
+    __tablename__ = 'order_status_change'
+    __table_args__ = (
+        db.Index('ix_order_status_change_order', 'work_order_id', 'changed_at'),
+        db.Index('ix_order_status_change_changed', 'changed_at', 'from_status'),
+        db.Index('ix_order_status_change_week', 'week', 'to_status'),
+    )
+    order_status_change_id = db.Column(db.Integer, primary_key=True)
+    work_order_id = db.Column(db.Integer, nullable=False)
+    from_status = db.Column(db.String(50))
+    to_status = db.Column(db.String(50), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    week = db.Column(db.Date, nullable=False)
+    dwell_seconds = db.Column(db.Integer)
+    user_account_id = db.Column(db.Integer)
+
+
+class ReportRevenue(db.Model):
+    # Сводка по периодам (period: day, week, month; period_start - первый день периода).
+    # Заполняется app/reports.py, выданные заказы относятся к дате завершения.
+    __tablename__ = 'report_revenue'
+    period = db.Column(db.String(10), primary_key=True)
+    period_start = db.Column(db.Date, primary_key=True)
+    orders_received = db.Column(db.Integer, nullable=False, default=0)
+    orders_done = db.Column(db.Integer, nullable=False, default=0)
+    work_revenue = db.Column(db.Numeric(12, 2), nullable=False, default=Decimal('0.00'))
+    parts_revenue = db.Column(db.Numeric(12, 2), nullable=False, default=Decimal('0.00'))
+
+
+class ReportPartUsage(db.Model):
+    # Запчасти, установленные в выданные заказы, по периодам
+    __tablename__ = 'report_part_usage'
+    period = db.Column(db.String(10), primary_key=True)
+    period_start = db.Column(db.Date, primary_key=True)
+    name = db.Column(db.String(100), primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=Decimal('0.00'))
+
+
+class ReportDirtyDay(db.Model):
+    # Дни, данные которых изменились после последнего обновления сводок.
+    # Без уникальности по day: повторная отметка дня не конфликтует с параллельной записью.
+    __tablename__ = 'report_dirty_day'
+    report_dirty_day_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+
+
+class Job(db.Model):
+    # Фоновая задача (app/jobs.py): status pending -> running -> done | failed
+    __tablename__ = 'job'
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at', 'job_id'),
+        db.Index('ix_job_finished', 'finished_at'),
+    )
+    job_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    worker = db.Column(db.String(100))
+    last_error = db.Column(db.Text)
+
+
+class CacheVersion(db.Model):
+    # Версия данных таблицы для кэша фрагментов; увеличивается после каждого коммита, меняющего таблицу
+    __tablename__ = 'cache_version'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Создаем backref-атрибуты (Part.supply, WorkOrder.client, ...) сразу,
+# чтобы на них можно было ссылаться в опциях загрузки на уровне модулей
+configure_mappers()
 
 
 # --- Вспомогательные функции ---
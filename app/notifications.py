@@ -0,0 +1,109 @@
+import json
+import os
+import smtplib
+import threading
+from datetime import datetime
+from email.message import EmailMessage
+from flask import current_app
+from app import db
+from app.models import WorkOrder
+from app import jobs
+
+# Уведомления клиентов. Отправка идет из фоновой задачи (app/jobs.py), поэтому
+# время ответа маршрутов не зависит от канала доставки. Канал задается
+# NOTIFY_BACKEND: 'file' - строки JSON в файл (для разработки и проверок),
+# 'smtp' - письмо через SMTP-сервер.
+
+READY_STATUS = 'Готов к выдаче'
+
+
+class FileSender:
+    name = 'file'
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, to, subject, body):
+        line = json.dumps({
+            'sent_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'to': to, 'subject': subject, 'body': body,
+        }, ensure_ascii=False)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+class SmtpSender:
+    name = 'smtp'
+
+    def __init__(self, host, port, sender, user=None, password=None, tls=False, timeout=30):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.user = user
+        self.password = password
+        self.tls = tls
+        self.timeout = timeout
+
+    def send(self, to, subject, body):
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = to
+        message['Subject'] = subject
+        message.set_content(body)
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.tls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password or '')
+            smtp.send_message(message)
+
+
+def create_sender(app):
+    backend = app.config.get('NOTIFY_BACKEND', 'file')
+    if backend == 'file':
+        path = app.config.get('NOTIFY_FILE_PATH') or os.path.join(app.instance_path, 'notifications.log')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return FileSender(path)
+    if backend == 'smtp':
+        return SmtpSender(
+            app.config.get('NOTIFY_SMTP_HOST', 'localhost'),
+            app.config.get('NOTIFY_SMTP_PORT', 25),
+            app.config.get('NOTIFY_FROM'),
+            user=app.config.get('NOTIFY_SMTP_USER'),
+            password=app.config.get('NOTIFY_SMTP_PASSWORD'),
+            tls=app.config.get('NOTIFY_SMTP_TLS', False),
+        )
+    raise ValueError(f'Неизвестный NOTIFY_BACKEND: {backend}')
+
+
+def init_app(app):
+    app.extensions['notification_sender'] = create_sender(app)
+
+
+def get_sender():
+    return current_app.extensions['notification_sender']
+
+
+def order_status_changed(order, old_status):
+    # Вызывается маршрутами до коммита: задача уходит в очередь вместе со сменой статуса
+    if order.status == READY_STATUS and old_status != READY_STATUS:
+        jobs.enqueue('notify_order_ready', order_id=order.work_order_id)
+
+
+@jobs.task('notify_order_ready')
+def notify_order_ready(order_id):
+    order = db.session.get(WorkOrder, order_id)
+    # Заказ удален или статус уже сменился - уведомление неактуально
+    if order is None or order.status != READY_STATUS:
+        return
+    user = order.client.user if order.client else None
+    if user is None or not user.email:
+        return
+    get_sender().send(
+        user.email,
+        f'Заказ №{order.work_order_id} готов к выдаче',
+        f'Здравствуйте, {order.client.first_name}!\n\n'
+        f'Ремонт {order.phone_model} по заказу №{order.work_order_id} завершен, '
+        f'телефон можно забрать. К оплате: {order.total_cost} BYN.\n',
+    )
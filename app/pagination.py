@@ -0,0 +1,102 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from flask import request, url_for, current_app
+from sqlalchemy import tuple_, literal
+
+
+class KeysetPage:
+    # Одна страница курсорной (keyset) пагинации
+
+    def __init__(self, items, keys, has_prev, has_next):
+        self.items = items
+        self.keys = keys
+        self.has_prev = has_prev
+        self.has_next = has_next
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _cursor(self, item):
+        return encode_cursor([getattr(item, col.key) for col in self.keys])
+
+    @property
+    def prev_cursor(self):
+        return self._cursor(self.items[0]) if self.items and self.has_prev else None
+
+    @property
+    def next_cursor(self):
+        return self._cursor(self.items[-1]) if self.items and self.has_next else None
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, date) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, keys):
+    # Возвращает значения ключей или None, если курсор поврежден
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(keys):
+            return None
+        result = []
+        for col, value in zip(keys, values):
+            python_type = col.type.python_type
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            elif python_type is int:
+                value = int(value)
+            result.append(value)
+        return result
+    except (binascii.Error, ValueError, TypeError, NotImplementedError):
+        return None
+
+
+def keyset_paginate(query, keys, descending=True, per_page=None):
+    """Страница запроса, отсортированного по ключам keys (последний ключ - уникальный).
+
+    Курсоры берутся из параметров after/before строки запроса. В отличие от
+    OFFSET, условие (k1, k2) < (:v1, :v2) идет по индексу, поэтому время ответа
+    не зависит от номера страницы.
+    """
+    per_page = per_page or current_app.config.get('ITEMS_PER_PAGE', 50)
+    after = request.args.get('after')
+    before = request.args.get('before')
+
+    backwards = bool(before) and not after
+    cursor = decode_cursor(before if backwards else after, keys) if (before or after) else None
+
+    # При движении назад читаем в обратном порядке и затем переворачиваем
+    desc_order = descending != backwards
+    query = query.order_by(None)
+    if cursor is not None:
+        row = tuple_(*keys)
+        bound = tuple_(*[literal(value, col.type) for col, value in zip(keys, cursor)])
+        query = query.filter(row < bound if desc_order else row > bound)
+    query = query.order_by(*[col.desc() if desc_order else col.asc() for col in keys])
+
+    items = query.limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    if backwards:
+        items.reverse()
+        return KeysetPage(items, keys, has_prev=has_more, has_next=True)
+    return KeysetPage(items, keys, has_prev=cursor is not None, has_next=has_more)
+
+
+def page_url(**cursor):
+    # Ссылка на текущую страницу с новым курсором; поиск и фильтры сохраняются
+    args = request.args.to_dict()
+    args.pop('after', None)
+    args.pop('before', None)
+    args.update({name: value for name, value in cursor.items() if value})
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Хэширование паролей с настраиваемыми методом и стоимостью (PASSWORD_HASH_METHOD).
+# Хэши со старыми параметрами пересчитываются при успешном входе.
+# Проверка выполняется в ограниченном пуле потоков: hashlib отпускает GIL,
+# поэтому остальные потоки процесса продолжают обслуживать запросы, а число
+# одновременных проверок (и нагрузка на CPU) не превышает размер пула.
+
+
+class PasswordCheckBusy(Exception):
+    # Очередь проверок переполнена
+    pass
+
+
+_lock = threading.Lock()
+
+
+def _config(name, default=None):
+    return current_app.config.get(name, default)
+
+
+def _pool():
+    # (пул, семафор очереди) приложения; создаются при первой проверке
+    pool = current_app.extensions.get('password_pool')
+    if pool is None:
+        with _lock:
+            pool = current_app.extensions.get('password_pool')
+            if pool is None:
+                pool = (
+                    ThreadPoolExecutor(max_workers=_config('PASSWORD_VERIFY_THREADS'), thread_name_prefix='password'),
+                    threading.BoundedSemaphore(_config('PASSWORD_VERIFY_MAX_PENDING', 64)),
+                )
+                current_app.extensions['password_pool'] = pool
+    return pool
+
+
+@lru_cache(maxsize=16)
+def _method_prefix(method):
+    # 'scrypt' -> 'scrypt:32768:8:1': полные параметры, как они записываются в хэш
+    return generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+
+
+def hash_password(password):
+    return generate_password_hash(
+        password,
+        method=_config('PASSWORD_HASH_METHOD', 'scrypt'),
+        salt_length=_config('PASSWORD_SALT_LENGTH', 16),
+    )
+
+
+def needs_rehash(password_hash):
+    return password_hash.split('$', 1)[0] != _method_prefix(_config('PASSWORD_HASH_METHOD', 'scrypt'))
+
+
+def verify(password_hash, password):
+    """Проверка пароля в пуле потоков. PasswordCheckBusy, если очередь проверок заполнена."""
+    if not password_hash or password is None:
+        return False
+    executor, pending = _pool()
+    if not pending.acquire(blocking=False):
+        raise PasswordCheckBusy()
+    try:
+        return executor.submit(check_password_hash, password_hash, password).result()
+    finally:
+        pending.release()
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from flask import current_app, has_app_context, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# Пул соединений с базой. Параметры берутся из конфигурации (DB_POOL_* в
+# config.py, значения из окружения) и задаются на каждый процесс: при N
+# воркерах gunicorn к базе открывается до N * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+# соединений. Пул считает выдачи соединений, ожидание свободного соединения
+# и отказы по таймауту; метрики доступны на /admin/_pool.
+#
+# DB_STATEMENT_TIMEOUT задается соединениям Postgres при подключении и
+# ограничивает запросы страниц. Команды flask (построение индексов, полный
+# пересчет отчетов, backfill, воркер задач) работают вне HTTP-запроса и
+# снимают ограничение в каждой своей транзакции (SET LOCAL).
+
+
+class InstrumentedQueuePool(QueuePool):
+    # QueuePool со счетчиками ожидания
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(config, url=None):
+    """SQLALCHEMY_ENGINE_OPTIONS для URI приложения (или для url, например реплики).
+
+    Явно заданные в SQLALCHEMY_ENGINE_OPTIONS значения имеют приоритет.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    url = make_url(url or config['SQLALCHEMY_DATABASE_URI'])
+    if _is_memory_sqlite(url):
+        # Одна база в памяти процесса, пул не нужен
+        return options
+
+    options.setdefault('poolclass', InstrumentedQueuePool)
+    options.setdefault('pool_size', config.get('DB_POOL_SIZE', 5))
+    options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 5))
+    options.setdefault('pool_timeout', config.get('DB_POOL_TIMEOUT', 5))
+    options.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', 1800))
+    options.setdefault('pool_pre_ping', config.get('DB_POOL_PRE_PING', True))
+
+    statement_timeout = config.get('DB_STATEMENT_TIMEOUT', 0)
+    if statement_timeout and url.get_backend_name() == 'postgresql':
+        connect_args = dict(options.get('connect_args') or {})
+        connect_args.setdefault('options', f'-c statement_timeout={int(statement_timeout)}')
+        options['connect_args'] = connect_args
+    return options
+
+
+@event.listens_for(Session, 'after_begin')
+def _lift_statement_timeout(session, transaction, connection):
+    # SET LOCAL действует до конца транзакции, соединение возвращается в пул с лимитом
+    if (connection.dialect.name == 'postgresql' and has_app_context() and not has_request_context()
+            and current_app.config.get('DB_STATEMENT_TIMEOUT')):
+        connection.exec_driver_sql('SET LOCAL statement_timeout = 0')
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {
+        'pid': os.getpid(),
+        'pool': type(pool).__name__,
+        'status': pool.status(),
+    }
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout(),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._stats_lock:
+            stats.update({
+                'checkouts': pool.checkouts,
+                'timeouts': pool.timeouts,
+                'wait_avg_ms': round(pool.wait_total / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+                'wait_max_ms': round(pool.wait_max * 1000, 3),
+            })
+    return stats
+
+
+def init_app(app, engine):
+    # Процесс-потомок (gunicorn --preload) не должен использовать соединения родителя
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+    @app.errorhandler(PoolTimeoutError)
+    def pool_exhausted(error):
+        stats = pool_stats(engine)
+        app.logger.warning('Пул соединений исчерпан: %s', stats.get('status'))
+        return 'Сервер перегружен: нет свободных соединений с базой. Повторите запрос позже.', 503, {
+            'Retry-After': '5',
+            'Content-Type': 'text/plain; charset=utf-8',
+        }
+
@@ -0,0 +1,150 @@
+import heapq
+import threading
+import time
+from collections import deque
+from flask import g, request, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+
+# Профилирование запросов (включается PROFILING_ENABLED). Для каждого endpoint
+# копятся последние PROFILING_WINDOW запросов: число SQL-запросов, время в базе,
+# время рендеринга шаблона и общее время, а также самые медленные SQL.
+# Запросы дольше PROFILING_SLOW_QUERY_MS пишутся в лог. Статистика своя у
+# каждого процесса. Накладные расходы - пара вызовов perf_counter на SQL-запрос.
+#
+# Время рендеринга включает запросы, выполненные из шаблона (ленивые загрузки),
+# поэтому db_ms и render_ms могут пересекаться.
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class EndpointStats:
+
+    def __init__(self, window, top):
+        self.samples = deque(maxlen=window)  # (total_ms, db_ms, render_ms, queries)
+        self.requests = 0
+        self.top = top
+        self.slowest = []  # куча (ms, statement), не больше top
+
+    def add(self, sample, statements):
+        self.requests += 1
+        self.samples.append(sample)
+        for item in statements:
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, item)
+            elif item[0] > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, item)
+
+    def summary(self, endpoint):
+        columns = list(zip(*self.samples)) or [(), (), (), ()]
+        total, db_time, render, queries = columns
+        return {
+            'endpoint': endpoint,
+            'requests': self.requests,
+            'p50_ms': round(percentile(total, 0.5), 1),
+            'p95_ms': round(percentile(total, 0.95), 1),
+            'p99_ms': round(percentile(total, 0.99), 1),
+            'db_p95_ms': round(percentile(db_time, 0.95), 1),
+            'render_p95_ms': round(percentile(render, 0.95), 1),
+            'queries_avg': round(sum(queries) / len(queries), 1) if queries else 0,
+            'queries_max': max(queries) if queries else 0,
+            'slowest': [
+                {'ms': round(ms, 1), 'statement': statement}
+                for ms, statement in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+
+class Profiler:
+
+    def __init__(self, app, engines):
+        self.app = app
+        self.slow_ms = app.config.get('PROFILING_SLOW_QUERY_MS', 200)
+        self.window = app.config.get('PROFILING_WINDOW', 500)
+        self.top = app.config.get('PROFILING_TOP_STATEMENTS', 5)
+        self.stats = {}
+        self._lock = threading.Lock()
+
+        # Все базы приложения, включая реплику (app/replica.py)
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Время начала хранится в контексте выполнения: у упавшего запроса
+        # after_cursor_execute не вызывается, и метка пропадает вместе с контекстом
+        if context is not None:
+            context.profiler_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'profiler_started', None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        profile = g.get('profile') if has_request_context() else None
+        if profile is not None:
+            profile['queries'] += 1
+            profile['db_ms'] += elapsed_ms
+            # Только top самых долгих запросов запроса
+            item = (elapsed_ms, statement[:1000])
+            if len(profile['statements']) < self.top:
+                heapq.heappush(profile['statements'], item)
+            elif elapsed_ms > profile['statements'][0][0]:
+                heapq.heapreplace(profile['statements'], item)
+        if elapsed_ms >= self.slow_ms:
+            endpoint = request.endpoint if has_request_context() else '-'
+            self.app.logger.warning('Медленный SQL (%.1f мс, %s): %s', elapsed_ms, endpoint, statement[:1000])
+
+    def _start_request(self):
+        g.profile = {'started': time.perf_counter(), 'queries': 0, 'db_ms': 0.0,
+                     'render_ms': 0.0, 'render_started': None, 'statements': []}
+
+    def _before_render(self, sender, template, context, **extra):
+        profile = g.get('profile')
+        if profile is not None and profile['render_started'] is None:
+            profile['render_started'] = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        profile = g.get('profile')
+        if profile is not None and profile['render_started'] is not None:
+            profile['render_ms'] += (time.perf_counter() - profile['render_started']) * 1000
+            profile['render_started'] = None
+
+    def _finish_request(self, response):
+        profile = g.pop('profile', None)
+        if profile is None or request.endpoint is None or request.endpoint == 'static':
+            return response
+        total_ms = (time.perf_counter() - profile['started']) * 1000
+        sample = (total_ms, profile['db_ms'], profile['render_ms'], profile['queries'])
+        with self._lock:
+            stats = self.stats.get(request.endpoint)
+            if stats is None:
+                stats = self.stats[request.endpoint] = EndpointStats(self.window, self.top)
+            stats.add(sample, profile['statements'])
+        return response
+
+    def summary(self):
+        with self._lock:
+            rows = [stats.summary(endpoint) for endpoint, stats in self.stats.items()]
+        return sorted(rows, key=lambda row: row['p95_ms'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+
+
+def init_app(app, engines):
+    if app.config.get('PROFILING_ENABLED'):
+        app.extensions['profiler'] = Profiler(app, engines)
+
+
+def get_profiler(app):
+    return app.extensions.get('profiler')
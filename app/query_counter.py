@@ -0,0 +1,36 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from app import db
+
+
+class QueryCounter:
+    # Счетчик SQL-запросов, отправленных движком (подписка на события engine)
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Считает запросы внутри блока:
+
+        with count_queries() as counter:
+            client.get('/admin/orders')
+        assert counter.count == 2
+
+    Нужен активный контекст приложения, если engine не передан явно.
+    """
+    engine = engine or db.engine
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter._on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter._on_execute)
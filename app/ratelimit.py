@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app
+
+# Ограничение частоты попыток входа: token bucket на IP и на email.
+# Корзина вмещает capacity попыток и пополняется на capacity за period секунд.
+# Проверка выполняется до запроса к базе и проверки пароля, поэтому поток
+# неверных паролей не занимает CPU хэшированием. Хранилище 'sqlite' общее для
+# всех процессов на машине (несколько воркеров gunicorn), 'memory' - в процессе.
+
+
+class BucketStore:
+    """Интерфейс хранилища корзин."""
+
+    def consume(self, key, capacity, period):
+        # (разрешено, секунд до появления следующего токена)
+        raise NotImplementedError
+
+    def reset(self, key):
+        raise NotImplementedError
+
+
+def _refill(tokens, updated, now, capacity, period):
+    return min(capacity, tokens + (now - updated) * capacity / period)
+
+
+def _take(tokens, capacity, period):
+    if tokens >= 1:
+        return True, tokens - 1, 0
+    return False, tokens, (1 - tokens) * period / capacity
+
+
+class MemoryBucketStore(BucketStore):
+
+    PURGE_SIZE = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> (tokens, updated, period)
+
+    def consume(self, key, capacity, period):
+        with self._lock:
+            now = time.time()
+            if len(self._buckets) >= self.PURGE_SIZE:
+                # Полные корзины ничем не отличаются от отсутствующих
+                self._buckets = {k: b for k, b in self._buckets.items() if now - b[1] < b[2]}
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, period))
+            allowed, tokens, retry_after = _take(_refill(tokens, updated, now, capacity, period), capacity, period)
+            self._buckets[key] = (tokens, now, period)
+            return allowed, retry_after
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class SqliteBucketStore(BucketStore):
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        conn = self._connect()
+        conn.execute('CREATE TABLE IF NOT EXISTS bucket ('
+                     'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, period REAL NOT NULL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key, capacity, period):
+        conn = self._connect()
+        now = time.time()
+        # BEGIN IMMEDIATE: чтение и запись корзины атомарны между процессами
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            allowed, tokens, retry_after = _take(_refill(tokens, updated, now, capacity, period), capacity, period)
+            conn.execute('INSERT OR REPLACE INTO bucket (key, tokens, updated, period) VALUES (?, ?, ?, ?)',
+                         (key, tokens, now, period))
+            self._calls += 1
+            if self._calls % self.PURGE_EVERY == 0:
+                conn.execute('DELETE FROM bucket WHERE ? - updated >= period', (now,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+    def reset(self, key):
+        self._connect().execute('DELETE FROM bucket WHERE key = ?', (key,))
+
+
+def create_store(app):
+    backend = app.config.get('RATELIMIT_BACKEND', 'sqlite')
+    if backend == 'memory':
+        return MemoryBucketStore()
+    if backend == 'sqlite':
+        path = app.config.get('RATELIMIT_SQLITE_PATH') or os.path.join(app.instance_path, 'ratelimit.db')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return SqliteBucketStore(path)
+    raise ValueError(f'Неизвестный RATELIMIT_BACKEND: {backend}')
+
+
+def init_app(app):
+    app.extensions['ratelimit_store'] = create_store(app)
+
+
+def parse_limit(value):
+    # '20/60' -> (20, 60.0): 20 попыток за 60 секунд
+    capacity, period = str(value).split('/')
+    return int(capacity), float(period)
+
+
+def _email_key(email):
+    return 'login:email:' + (email or '').strip().lower()
+
+
+def check_login(ip, email):
+    """Списывает попытку входа с корзин IP и email.
+
+    Возвращает None, если попытка разрешена, иначе число секунд до следующей.
+    """
+    if not current_app.config.get('RATELIMIT_ENABLED', True):
+        return None
+    store = current_app.extensions['ratelimit_store']
+    waits = []
+    for key, limit in (('login:ip:' + (ip or ''), 'LOGIN_RATE_LIMIT_IP'),
+                       (_email_key(email), 'LOGIN_RATE_LIMIT_EMAIL')):
+        allowed, retry_after = store.consume(key, *parse_limit(current_app.config[limit]))
+        if not allowed:
+            waits.append(retry_after)
+    return max(waits) if waits else None
+
+
+def login_succeeded(email):
+    # Успешный вход снимает блокировку email (неудачные попытки владельца забываются)
+    if current_app.config.get('RATELIMIT_ENABLED', True):
+        current_app.extensions['ratelimit_store'].reset(_email_key(email))
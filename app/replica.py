@@ -0,0 +1,101 @@
+import os
+import time
+from functools import wraps
+from flask import g, request, session, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Чтение с реплики. Если задан SQLALCHEMY_REPLICA_URI, у приложения появляется
+# bind 'replica', и GET-запросы к представлениям с декоратором @read_replica
+# (списки, отчеты, выгрузки) читают с него. Все остальное идет в основную базу:
+# запись (flush, UPDATE/INSERT/DELETE), SELECT ... FOR UPDATE, текстовые
+# запросы и любые чтения после записи в том же запросе. После коммита с
+# изменениями сессия пользователя на DB_REPLICA_PIN_SECONDS "прикрепляется"
+# к основной базе: редирект после сохранения формы показывает свежие данные,
+# даже если реплика отстает.
+#
+# Без SQLALCHEMY_REPLICA_URI все запросы идут в основную базу.
+
+REPLICA_BIND = 'replica'
+PIN_KEY = 'db_primary_until'
+
+
+class RoutingSession(Session):
+    # Сессия Flask-SQLAlchemy, отправляющая разрешенные чтения на реплику
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._reads_from_replica(clause):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self, clause):
+        if not (has_app_context() and g.get('db_read_replica')):
+            return False
+        if self._flushing or self.info.get('db_wrote') or g.get('db_wrote'):
+            return False
+        # Только обычный SELECT: блокирующие чтения - в основную базу
+        return (clause is not None and getattr(clause, 'is_select', False)
+                and getattr(clause, '_for_update_arg', None) is None)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_flush(session, flush_context):
+    session.info['db_wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['db_wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_write(session):
+    if session.info.pop('db_wrote', False) and has_app_context():
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_write(session):
+    session.info.pop('db_wrote', None)
+
+
+def read_replica(f):
+    """Разрешает GET-запросу представления читать с реплики (если сессия не прикреплена)."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.method in ('GET', 'HEAD') and session.get(PIN_KEY, 0) <= time.time():
+            g.db_read_replica = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def configure(app):
+    # Вызывается до db.init_app: bind реплики с теми же параметрами пула
+    uri = app.config.get('SQLALCHEMY_REPLICA_URI')
+    if not uri:
+        return
+    from app import pool
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds[REPLICA_BIND] = {'url': uri, **pool.engine_options(app.config, uri)}
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def init_app(app, engines):
+    engine = engines.get(REPLICA_BIND)
+    if engine is None:
+        return
+    # Процесс-потомок (gunicorn --preload) не должен использовать соединения родителя
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+    pin_seconds = app.config.get('DB_REPLICA_PIN_SECONDS', 5)
+
+    @app.after_request
+    def pin_to_primary(response):
+        # Следующие запросы пользователя читают из основной базы, пока реплика догоняет
+        if g.get('db_wrote') and session and pin_seconds > 0:
+            session[PIN_KEY] = time.time() + pin_seconds
+        return response
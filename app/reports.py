@@ -0,0 +1,293 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event, func, select, insert, delete, and_, or_, inspect, desc
+from sqlalchemy.orm import Session
+from app import db
+from app.models import WorkOrder, Part, ReportRevenue, ReportPartUsage, ReportDirtyDay
+from app.status_history import week_start
+from app import cache
+
+# Отчеты по выручке и запчастям за день, неделю и месяц. Данные берутся из
+# сводных таблиц report_revenue и report_part_usage, а не из work_order + part.
+# При каждом flush, меняющем заказы или их запчасти, затронутые дни
+# (дата приема и дата завершения, старые и новые) пишутся в report_dirty_day.
+# Команда `flask reports refresh` пересчитывает только эти дни, а из дневных
+# строк - их недели и месяцы. Выданный заказ относится к дате завершения
+# (к дате приема, если ее нет).
+#
+# Пакетные UPDATE/DELETE запчастей в обход flush (установка в заказ, правка
+# поставки, выдача по виду) отмечают дни сами через mark_orders_dirty.
+# Изменения вне приложения (генератор данных, ручные правки в базе) не
+# отмечаются, после них нужен `flask reports refresh --full`.
+
+PERIODS = ('day', 'week', 'month')
+DONE_STATUS = 'Выдан'
+TOP_PARTS_LIMIT = 10
+CHUNK_SIZE = 500
+ZERO = Decimal('0.00')
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def period_start(period, day):
+    if period == 'week':
+        return week_start(day)
+    if period == 'month':
+        return month_start(day)
+    return day
+
+
+def period_end(period, start):
+    if period == 'week':
+        return start + timedelta(days=7)
+    if period == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _order_days(state):
+    days = set()
+    for field in ('received_date', 'completion_date'):
+        days.update(_as_date(value) for value in state.attrs[field].history.sum() if value)
+    return days
+
+
+def _order_dates(executor, order_ids):
+    # Даты приема и завершения заказов (executor - сессия или соединение)
+    rows = executor.execute(
+        select(WorkOrder.received_date, WorkOrder.completion_date)
+        .where(WorkOrder.work_order_id.in_(order_ids))
+    ).all()
+    return {_as_date(value) for row in rows for value in row if value}
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_after_flush(session, flush_context):
+    days, order_ids = set(), set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, WorkOrder):
+            days.update(_order_days(inspect(obj)))
+        elif isinstance(obj, Part):
+            order_ids.update(i for i in inspect(obj).attrs.work_order_id.history.sum() if i)
+    connection = session.connection()
+    if order_ids:
+        days.update(_order_dates(connection, order_ids))
+    if days:
+        connection.execute(insert(ReportDirtyDay), [{'day': day} for day in sorted(days)])
+        cache.mark_written(session, ReportDirtyDay.__tablename__)
+
+
+def mark_dirty(days):
+    # Для изменений в обход ORM; коммит за вызывающим
+    days = {_as_date(day) for day in days if day}
+    if days:
+        db.session.execute(insert(ReportDirtyDay), [{'day': day} for day in sorted(days)])
+
+
+def mark_orders_dirty(order_ids):
+    # Дни заказов, запчасти которых изменены пакетным запросом; коммит за вызывающим
+    order_ids = {order_id for order_id in order_ids if order_id}
+    if order_ids:
+        mark_dirty(_order_dates(db.session, order_ids))
+
+
+def _done_day():
+    return func.coalesce(WorkOrder.completion_date, WorkOrder.received_date)
+
+
+def _rebuild_days(days):
+    for start in range(0, len(days), CHUNK_SIZE):
+        chunk = days[start:start + CHUNK_SIZE]
+        db.session.execute(delete(ReportRevenue).where(
+            ReportRevenue.period == 'day', ReportRevenue.period_start.in_(chunk)))
+        db.session.execute(delete(ReportPartUsage).where(
+            ReportPartUsage.period == 'day', ReportPartUsage.period_start.in_(chunk)))
+
+        # Выданные заказы дня: по дате завершения, без нее - по дате приема
+        done_filter = and_(WorkOrder.status == DONE_STATUS, or_(
+            WorkOrder.completion_date.in_(chunk),
+            and_(WorkOrder.completion_date.is_(None), WorkOrder.received_date.in_(chunk)),
+        ))
+        totals = defaultdict(lambda: [0, 0, ZERO, ZERO])
+        for day, count in db.session.execute(
+            select(WorkOrder.received_date, func.count())
+            .where(WorkOrder.received_date.in_(chunk))
+            .group_by(WorkOrder.received_date)
+        ):
+            totals[_as_date(day)][0] = count
+        for day, count, work in db.session.execute(
+            select(_done_day(), func.count(), func.sum(WorkOrder.work_cost))
+            .where(done_filter).group_by(_done_day())
+        ):
+            totals[_as_date(day)][1] = count
+            totals[_as_date(day)][2] = work or ZERO
+
+        part_rows = []
+        for day, name, units, revenue in db.session.execute(
+            select(_done_day(), Part.name, func.count(), func.sum(Part.price))
+            .join(WorkOrder, Part.work_order_id == WorkOrder.work_order_id)
+            .where(done_filter).group_by(_done_day(), Part.name)
+        ):
+            day = _as_date(day)
+            totals[day][3] += revenue or ZERO
+            part_rows.append({'period': 'day', 'period_start': day, 'name': name,
+                              'units': units, 'revenue': revenue or ZERO})
+
+        if totals:
+            db.session.execute(insert(ReportRevenue), [
+                {'period': 'day', 'period_start': day, 'orders_received': received, 'orders_done': done,
+                 'work_revenue': work, 'parts_revenue': parts}
+                for day, (received, done, work, parts) in totals.items()
+            ])
+        if part_rows:
+            db.session.execute(insert(ReportPartUsage), part_rows)
+
+
+def _rollup(period, starts):
+    # Недели и месяцы складываются из уже пересчитанных дневных строк
+    if not starts:
+        return
+    starts = sorted(starts)
+    low, high = starts[0], period_end(period, starts[-1])
+    wanted = set(starts)
+    for start in range(0, len(starts), CHUNK_SIZE):
+        chunk = starts[start:start + CHUNK_SIZE]
+        db.session.execute(delete(ReportRevenue).where(
+            ReportRevenue.period == period, ReportRevenue.period_start.in_(chunk)))
+        db.session.execute(delete(ReportPartUsage).where(
+            ReportPartUsage.period == period, ReportPartUsage.period_start.in_(chunk)))
+
+    totals = defaultdict(lambda: [0, 0, ZERO, ZERO])
+    for row in db.session.execute(
+        select(ReportRevenue.period_start, ReportRevenue.orders_received, ReportRevenue.orders_done,
+               ReportRevenue.work_revenue, ReportRevenue.parts_revenue)
+        .where(ReportRevenue.period == 'day', ReportRevenue.period_start >= low, ReportRevenue.period_start < high)
+    ):
+        key = period_start(period, row.period_start)
+        if key in wanted:
+            total = totals[key]
+            total[0] += row.orders_received
+            total[1] += row.orders_done
+            total[2] += row.work_revenue
+            total[3] += row.parts_revenue
+
+    usage = defaultdict(lambda: [0, ZERO])
+    for row in db.session.execute(
+        select(ReportPartUsage.period_start, ReportPartUsage.name, ReportPartUsage.units, ReportPartUsage.revenue)
+        .where(ReportPartUsage.period == 'day', ReportPartUsage.period_start >= low,
+               ReportPartUsage.period_start < high)
+    ):
+        key = period_start(period, row.period_start)
+        if key in wanted:
+            usage[key, row.name][0] += row.units
+            usage[key, row.name][1] += row.revenue
+
+    if totals:
+        db.session.execute(insert(ReportRevenue), [
+            {'period': period, 'period_start': key, 'orders_received': received, 'orders_done': done,
+             'work_revenue': work, 'parts_revenue': parts}
+            for key, (received, done, work, parts) in totals.items()
+        ])
+    if usage:
+        db.session.execute(insert(ReportPartUsage), [
+            {'period': period, 'period_start': key, 'name': name, 'units': units, 'revenue': revenue}
+            for (key, name), (units, revenue) in usage.items()
+        ])
+
+
+def refresh(full=False):
+    """Пересчитывает сводки за измененные дни (все, если full); возвращает число дней.
+
+    Коммит за вызывающим.
+    """
+    last_id = db.session.query(func.max(ReportDirtyDay.report_dirty_day_id)).scalar()
+    if full:
+        db.session.execute(delete(ReportRevenue))
+        db.session.execute(delete(ReportPartUsage))
+        received = db.session.scalars(select(WorkOrder.received_date).distinct())
+        completed = db.session.scalars(select(WorkOrder.completion_date).distinct())
+        days = {_as_date(day) for day in list(received) + list(completed) if day}
+    elif last_id is None:
+        return 0
+    else:
+        days = set(db.session.scalars(
+            select(ReportDirtyDay.day).where(ReportDirtyDay.report_dirty_day_id <= last_id).distinct()
+        ))
+
+    days = sorted(days)
+    _rebuild_days(days)
+    _rollup('week', {week_start(day) for day in days})
+    _rollup('month', {month_start(day) for day in days})
+    if last_id is not None:
+        # Отметки, добавленные во время пересчета, остаются до следующего запуска
+        db.session.execute(delete(ReportDirtyDay).where(ReportDirtyDay.report_dirty_day_id <= last_id))
+    return len(days)
+
+
+def pending_days():
+    return db.session.query(func.count(func.distinct(ReportDirtyDay.day))).scalar() or 0
+
+
+def revenue_report(period, start, end):
+    """Строки сводки за периоды, начинающиеся в [period_start(start), end)."""
+    rows = ReportRevenue.query.filter(
+        ReportRevenue.period == period,
+        ReportRevenue.period_start >= period_start(period, start),
+        ReportRevenue.period_start < end,
+    ).order_by(ReportRevenue.period_start).all()
+    return [
+        {
+            'period_start': row.period_start,
+            'orders_received': row.orders_received,
+            'orders_done': row.orders_done,
+            'work_revenue': row.work_revenue,
+            'parts_revenue': row.parts_revenue,
+            'revenue': row.work_revenue + row.parts_revenue,
+        }
+        for row in rows
+    ]
+
+
+def top_parts(period, start, end, limit=TOP_PARTS_LIMIT):
+    units = func.sum(ReportPartUsage.units)
+    return db.session.execute(
+        select(ReportPartUsage.name, units.label('units'), func.sum(ReportPartUsage.revenue).label('revenue'))
+        .where(
+            ReportPartUsage.period == period,
+            ReportPartUsage.period_start >= period_start(period, start),
+            ReportPartUsage.period_start < end,
+        )
+        .group_by(ReportPartUsage.name)
+        .order_by(desc(units), ReportPartUsage.name)
+        .limit(limit)
+    ).all()
+
+
+def default_period(period):
+    today = date.today()
+    if period == 'day':
+        return today - timedelta(days=30), today + timedelta(days=1)
+    if period == 'week':
+        return week_start(today) - timedelta(weeks=12), today + timedelta(days=1)
+    return month_start(today).replace(year=today.year - 1), today + timedelta(days=1)
+
+
+reports_cli = AppGroup('reports', help='Отчеты по выручке и запчастям.')
+
+
+@reports_cli.command('refresh')
+@click.option('--full', is_flag=True, help='Пересчитать все дни, а не только измененные')
+def refresh_command(full):
+    """Обновить сводки отчетов."""
+    days = refresh(full=full)
+    db.session.commit()
+    click.echo(f'Пересчитано дней: {days}')
@@ -1,55 +1,199 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, current_app
 from app import db
-from app.models import User, Client, Part, Supplier, Supply, WorkOrder, Role
-from datetime import datetime, date
+from app.models import User, Client, Part, Supplier, Supply, WorkOrder, Role, CatalogItem
+from datetime import datetime, date, timedelta
 from decimal import Decimal
-from sqlalchemy import func, or_, desc
+from sqlalchemy import func, or_, select, update, insert, delete
+from sqlalchemy.orm import undefer, joinedload, selectinload, contains_eager
 from app.decorators import admin_required
+from app.replica import read_replica
+from app.sessions import invalidate_user_sessions
+from app.pagination import keyset_paginate
+from app import dashboard
+from app import search
+from app import importer
+from app import export
+from app import pool
+from app import profiler
+from app import cache
+from app import status_history
+from app import reports
+from app import catalog
+from app import allocation
+from app import jobs
+from app import replica
+from app.http_cache import conditional_get
+from app import notifications
+from app.search import search_condition
 
 admin_bp = Blueprint('admin_bp', __name__, template_folder='templates', url_prefix='/admin')
 
+# Профили загрузки: какие связи нужны шаблону каждого списка.
+# Все они подгружаются фиксированным числом запросов, независимо от числа строк.
+ORDER_LIST_LOAD = (joinedload(WorkOrder.client), undefer(WorkOrder.parts_total))
+CLIENT_LIST_LOAD = (joinedload(Client.user), undefer(Client.orders_count))
+PART_LIST_LOAD = (
+    joinedload(Part.supply).joinedload(Supply.supplier),
+    joinedload(Part.order).joinedload(WorkOrder.client),
+)
+SUPPLY_LIST_LOAD = (contains_eager(Supply.supplier), selectinload(Supply.parts))
+SUPPLIER_LIST_LOAD = (selectinload(Supplier.supplies),)
+USER_LIST_LOAD = (joinedload(User.role_obj), joinedload(User.client))
+
+# Таблицы, от которых зависят кэшируемые фрагменты списков (app/cache.py)
+PART_LIST_TABLES = ('part', 'supply', 'supplier', 'work_order', 'client')
+SUPPLIER_LIST_TABLES = ('supplier', 'supply')
+SUPPLY_LIST_TABLES = ('supply', 'supplier', 'part')
+# Таблицы, от которых зависят остальные страницы (ETag, app/http_cache.py)
+INDEX_TABLES = ('dashboard_counter', 'part_usage_counter', 'work_order', 'client', 'catalog_item')
+ORDER_LIST_TABLES = ('work_order', 'client', 'part')
+CLIENT_LIST_TABLES = ('client', 'user_account', 'work_order')
+USER_LIST_TABLES = ('user_account', 'role', 'client')
+CATALOG_TABLES = ('catalog_item',)
+REPORT_TABLES = ('report_revenue', 'report_part_usage', 'report_dirty_day')
+TURNAROUND_TABLES = ('order_status_change',)
+
+# Размер страницы автодополнения в форме заказа
+LOOKUP_PAGE_SIZE = 20
+
 
 @admin_bp.route('/', endpoint='admin_index')
 @admin_required
+@read_replica
+@conditional_get(INDEX_TABLES)
 def admin_index():
-    
-    work_revenue = db.session.query(func.sum(WorkOrder.work_cost))\
-        .filter(WorkOrder.status == 'Выдан').scalar() or Decimal('0.00')
-    
-    parts_revenue = db.session.query(func.sum(Part.price))\
-        .join(WorkOrder)\
-        .filter(WorkOrder.status == 'Выдан').scalar() or Decimal('0.00')
+    # Счетчики и популярные запчасти читаются из сводных таблиц (app/dashboard.py)
+    stats = dashboard.get_stats()
+    recent_orders = WorkOrder.query.options(joinedload(WorkOrder.client)).order_by(WorkOrder.work_order_id.desc()).limit(5).all()
+    return render_template('admin/admin_index.html', **stats, recent_orders=recent_orders,
+                           low_stock=catalog.low_stock_count())
 
-    total_revenue = work_revenue + parts_revenue
-    
-    stats = {
-        'total_clients': Client.query.count(),
-        'active_orders': WorkOrder.query.filter(WorkOrder.status.in_(['Принят', 'В ремонте', 'Ожидает запчасти'])).count(),
-        'completed_orders': WorkOrder.query.filter_by(status='Выдан').count(),
-        'revenue': total_revenue,
-    }
-    
-    recent_orders = WorkOrder.query.order_by(WorkOrder.work_order_id.desc()).limit(5).all()
-    popular_parts = db.session.query(Part.name, func.count(Part.part_id)).group_by(Part.name).order_by(desc(func.count(Part.part_id))).limit(5).all()
-    return render_template('admin/admin_index.html', **stats, recent_orders=recent_orders, popular_parts=popular_parts)
+
+@admin_bp.route('/search', methods=['GET'], endpoint='global_search')
+@admin_required
+@read_replica
+def global_search():
+    # JSON для подсказок в строке поиска: по несколько результатов каждого типа
+    query_text = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', search.DEFAULT_LIMIT, type=int), search.MAX_LIMIT)
+    return jsonify(query=query_text, results=search.global_search(query_text, limit=max(limit, 1)))
+
+
+@admin_bp.route('/_pool', methods=['GET'], endpoint='pool_stats')
+@admin_required
+def pool_stats():
+    # Состояние пула соединений этого процесса (у каждого воркера свой пул)
+    stats = pool.pool_stats(db.engine)
+    replica_engine = db.engines.get(replica.REPLICA_BIND)
+    if replica_engine is not None:
+        stats['replica'] = pool.pool_stats(replica_engine)
+    return jsonify(stats)
+
+
+@admin_bp.route('/_cache', methods=['GET'], endpoint='cache_stats')
+@admin_required
+def cache_stats():
+    # Попадания и промахи кэша фрагментов этого процесса
+    return jsonify(cache.cache_stats(current_app))
+
+
+@admin_bp.route('/_jobs', methods=['GET'], endpoint='jobs_stats')
+@admin_required
+def jobs_stats():
+    # Глубина очереди фоновых задач и задержки выполнения
+    return jsonify(jobs.stats())
+
+
+@admin_bp.route('/_perf', methods=['GET', 'POST'], endpoint='perf_stats')
+@admin_required
+def perf_stats():
+    # Сводка профилировщика по endpoint этого процесса (PROFILING_ENABLED)
+    perf = profiler.get_profiler(current_app)
+    if request.method == 'POST' and perf:
+        perf.reset()
+        flash('Статистика сброшена.', 'info')
+        return redirect(url_for('admin_bp.perf_stats'))
+    rows = perf.summary() if perf else []
+    if request.args.get('format') == 'json':
+        return jsonify(enabled=perf is not None, endpoints=rows)
+    return render_template('admin/admin_perf.html', enabled=perf is not None, rows=rows,
+                           slow_ms=current_app.config.get('PROFILING_SLOW_QUERY_MS'))
+
+
+@admin_bp.route('/analytics/turnaround', methods=['GET'], endpoint='turnaround_analytics')
+@admin_required
+@read_replica
+@conditional_get(TURNAROUND_TABLES)
+def turnaround_analytics():
+    # Время в статусах и пропускная способность по неделям из журнала статусов
+    start, end = status_history.default_period()
+    try:
+        if request.args.get('from'):
+            start = datetime.strptime(request.args['from'], '%Y-%m-%d').date()
+        if request.args.get('to'):
+            end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() + timedelta(days=1)
+    except ValueError:
+        flash('Неверный формат даты.', 'danger')
+    dwell = status_history.dwell_by_status(start, end)
+    weeks = status_history.weekly_throughput(start, end)
+    if request.args.get('format') == 'json':
+        return jsonify(start=start.isoformat(), end=end.isoformat(), dwell=dwell,
+                       weeks=[dict(row, week=row['week'].isoformat()) for row in weeks])
+    return render_template('admin/admin_turnaround.html', dwell=dwell, weeks=weeks,
+                           start=start, end=end - timedelta(days=1))
+
+
+@admin_bp.route('/reports', methods=['GET', 'POST'], endpoint='admin_reports')
+@admin_required
+@read_replica
+@conditional_get(REPORT_TABLES)
+def admin_reports():
+    # Выручка и запчасти по периодам из сводных таблиц (app/reports.py)
+    if request.method == 'POST':
+        try:
+            days = reports.refresh()
+            db.session.commit()
+            flash(f'Сводки обновлены, пересчитано дней: {days}.', 'success')
+        except Exception:
+            db.session.rollback()
+            flash('Ошибка обновления сводок.', 'danger')
+        return redirect(url_for('admin_bp.admin_reports', **request.args))
+
+    period = request.args.get('period', 'month')
+    if period not in reports.PERIODS:
+        period = 'month'
+    start, end = reports.default_period(period)
+    try:
+        if request.args.get('from'):
+            start = datetime.strptime(request.args['from'], '%Y-%m-%d').date()
+        if request.args.get('to'):
+            end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() + timedelta(days=1)
+    except ValueError:
+        flash('Неверный формат даты.', 'danger')
+    rows = reports.revenue_report(period, start, end)
+    top_parts = reports.top_parts(period, start, end)
+    return render_template('admin/admin_reports.html', period=period, rows=rows, top_parts=top_parts,
+                           start=start, end=end - timedelta(days=1), pending=reports.pending_days())
 
 
 @admin_bp.route('/clients', methods=['GET'], endpoint='admin_clients')
 @admin_required
+@read_replica
+@conditional_get(CLIENT_LIST_TABLES)
 def admin_clients():
     search_query = request.args.get('q', '').strip()
     date_filter = request.args.get('date', '').strip()
-    clients_q = Client.query.order_by(Client.client_id.desc())
+    clients_q = Client.query.options(*CLIENT_LIST_LOAD)
     if search_query:
-        search = f'%{search_query}%'
-        clients_q = clients_q.filter(or_(Client.last_name.ilike(search), Client.first_name.ilike(search)))
+        clients_q = clients_q.filter(search_condition(search_query, Client.last_name, Client.first_name))
     if date_filter:
         try:
             date_obj = datetime.strptime(date_filter, '%Y-%m-%d').date()
             clients_q = clients_q.filter(User.created_at >= date_obj).filter(User.created_at < date_obj + datetime.timedelta(days=1)).outerjoin(User, Client.client_id == User.client_id)
         except ValueError:
             pass
-    return render_template('admin/admin_clients.html', clients=clients_q.all(), search_query=search_query, date_filter=date_filter)
+    clients = keyset_paginate(clients_q, (Client.client_id,))
+    return render_template('admin/admin_clients.html', clients=clients, search_query=search_query, date_filter=date_filter)
 
 
 @admin_bp.route('/client/manage', methods=['GET', 'POST'], endpoint='add_client')
@@ -72,6 +216,8 @@ def manage_client(id=None):
             
             # Обработка привязки/создания пользователя по email
             email = request.form.get('email', '').strip()
+            # Сессии пользователей, у которых меняется роль, email или клиент, завершаются
+            affected_users = set()
             if email:
                 existing_user = User.query.filter_by(email=email).first()
                 
@@ -81,10 +227,13 @@ def manage_client(id=None):
                     if existing_user and existing_user.user_account_id != client.user.user_account_id:
                         flash('Этот Email уже привязан к другому пользователю.', 'danger')
                         return redirect(request.url)
+                    if client.user.email != email or client.user.role_id != selected_role_id:
+                        affected_users.add(client.user.user_account_id)
                     client.user.email = email
                     client.user.role_id = selected_role_id
                 else:
                     if existing_user:
+                        affected_users.add(existing_user.user_account_id)
                         client.user = existing_user
                         client.user.role_id = selected_role_id
                     else:
@@ -100,7 +249,10 @@ def manage_client(id=None):
             
             if not id:
                 db.session.add(client)
+                dashboard.client_added()
             db.session.commit()
+            for user_id in affected_users:
+                invalidate_user_sessions(user_id)
             flash(f'Клиент "{client.full_name}" сохранен.', 'success')
             return redirect(url_for('admin_bp.admin_clients'))
         except Exception as e:
@@ -118,19 +270,25 @@ def manage_client(id=None):
 def delete_client(id):
     client = Client.query.get_or_404(id)
     try:
-        active_orders = client.orders.filter(WorkOrder.status != 'Отменен').count()
+        active_orders = WorkOrder.query.filter(WorkOrder.client_id == client.client_id, WorkOrder.status != 'Отменен').count()
         if active_orders > 0:
             flash(f'Невозможно удалить клиента. У него есть {active_orders} активный заказ(ов). Сначала завершите или отмените заказы.', 'danger')
             return redirect(url_for('admin_bp.admin_clients'))
         
+        user_id = client.user.user_account_id if client.user else None
         if client.user:
             db.session.delete(client.user)
         
-        for order in client.orders:
-            db.session.delete(order)
+        # Запчасти удаляемых заказов возвращаются на склад
+        part_ids = [part.part_id for order in client.orders for part in order.parts]
+        with dashboard.track_orders(*client.orders), catalog.track_parts(part_ids):
+            for order in client.orders:
+                db.session.delete(order)
         
         db.session.delete(client)
+        dashboard.client_removed()
         db.session.commit()
+        invalidate_user_sessions(user_id)
         flash(f'Клиент "{client.full_name}" и все связанные данные удалены.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -138,36 +296,148 @@ def delete_client(id):
     return redirect(url_for('admin_bp.admin_clients'))
 
 
-@admin_bp.route('/orders', methods=['GET'], endpoint='admin_orders')
-@admin_required
-def admin_orders():
-    search_query = request.args.get('q', '').strip()
-    status_filter = request.args.get('status', '').strip()
-    date_filter = request.args.get('date', '').strip()
-    
-    orders_q = WorkOrder.query.order_by(WorkOrder.received_date.desc())
-    
+ORDER_STATUSES = ['Принят', 'В ремонте', 'Ожидает запчасти', 'Готов к выдаче', 'Выдан', 'Отменен']
+
+
+def order_conditions(search_query, status_filter, date_filter):
+    # Фильтры списка заказов; общие для страницы и CSV-выгрузки
+    conditions = []
     if search_query:
-        search = f'%{search_query}%'
-        orders_q = orders_q.filter(or_(
-            Client.last_name.ilike(search),
-            Client.first_name.ilike(search),
-            WorkOrder.phone_model.ilike(search)
-        )).join(Client)
+        # Подзапрос по клиентам вместо JOIN: каждое условие идет по своему индексу
+        matching_clients = db.select(Client.client_id)\
+            .where(search_condition(search_query, Client.last_name, Client.first_name))
+        conditions.append(or_(
+            WorkOrder.client_id.in_(matching_clients),
+            search_condition(search_query, WorkOrder.phone_model)
+        ))
     
     if status_filter:
-        orders_q = orders_q.filter(WorkOrder.status == status_filter)
+        conditions.append(WorkOrder.status == status_filter)
     
     if date_filter:
         try:
             date_obj = datetime.strptime(date_filter, '%Y-%m-%d').date()
-            orders_q = orders_q.filter(WorkOrder.received_date == date_obj)
+            conditions.append(WorkOrder.received_date == date_obj)
         except ValueError:
             pass
+    return conditions
+
+
+@admin_bp.route('/orders', methods=['GET'], endpoint='admin_orders')
+@admin_required
+@read_replica
+@conditional_get(ORDER_LIST_TABLES)
+def admin_orders():
+    search_query = request.args.get('q', '').strip()
+    status_filter = request.args.get('status', '').strip()
+    date_filter = request.args.get('date', '').strip()
     
-    statuses = ['Принят', 'В ремонте', 'Ожидает запчасти', 'Готов к выдаче', 'Выдан', 'Отменен']
-    return render_template('admin/admin_orders.html', orders=orders_q.all(), search_query=search_query, 
-                         status_filter=status_filter, date_filter=date_filter, statuses=statuses)
+    # Клиент и сумма запчастей загружаются тем же запросом, что и заказы
+    orders_q = WorkOrder.query.options(*ORDER_LIST_LOAD)\
+        .filter(*order_conditions(search_query, status_filter, date_filter))
+    
+    orders = keyset_paginate(orders_q, (WorkOrder.received_date, WorkOrder.work_order_id))
+    return render_template('admin/admin_orders.html', orders=orders, search_query=search_query, 
+                         status_filter=status_filter, date_filter=date_filter, statuses=ORDER_STATUSES)
+
+
+@admin_bp.route('/export/orders.csv', methods=['GET'], endpoint='export_orders')
+@admin_required
+@read_replica
+def export_orders():
+    conditions = order_conditions(
+        request.args.get('q', '').strip(),
+        request.args.get('status', '').strip(),
+        request.args.get('date', '').strip(),
+    )
+    parts_total = func.coalesce(WorkOrder.parts_total, 0)
+    stmt = select(
+        WorkOrder.work_order_id, WorkOrder.received_date, WorkOrder.status,
+        Client.last_name, Client.first_name, Client.middle_name, Client.phone,
+        WorkOrder.phone_model, WorkOrder.work_cost, parts_total,
+        func.coalesce(WorkOrder.work_cost, 0) + parts_total,
+    ).join(Client, WorkOrder.client_id == Client.client_id)\
+        .where(*conditions).order_by(WorkOrder.work_order_id)
+    return export.csv_response('orders', [
+        'Номер', 'Дата приема', 'Статус', 'Фамилия', 'Имя', 'Отчество', 'Телефон',
+        'Модель', 'Работа', 'Запчасти', 'Итого',
+    ], stmt)
+
+
+@admin_bp.route('/export/clients.csv', methods=['GET'], endpoint='export_clients')
+@admin_required
+@read_replica
+def export_clients():
+    search_query = request.args.get('q', '').strip()
+    stmt = select(
+        Client.client_id, Client.last_name, Client.first_name, Client.middle_name, Client.phone,
+        User.email, User.created_at, Client.orders_count,
+    ).outerjoin(User, User.client_id == Client.client_id).order_by(Client.client_id)
+    if search_query:
+        stmt = stmt.where(search_condition(search_query, Client.last_name, Client.first_name))
+    return export.csv_response('clients', [
+        'ID', 'Фамилия', 'Имя', 'Отчество', 'Телефон', 'Email', 'Дата регистрации', 'Заказов',
+    ], stmt)
+
+
+@admin_bp.route('/export/parts.csv', methods=['GET'], endpoint='export_parts')
+@admin_required
+@read_replica
+def export_parts():
+    search_query = request.args.get('q', '').strip()
+    stmt = select(
+        Part.part_id, Part.name, Part.price, Supply.supply_id, Supply.supply_date,
+        Supplier.name, Part.work_order_id,
+    ).join(Supply, Part.supply_id == Supply.supply_id)\
+        .join(Supplier, Supply.supplier_id == Supplier.supplier_id)\
+        .order_by(Part.part_id)
+    if search_query:
+        stmt = stmt.where(search_condition(search_query, Part.name))
+    return export.csv_response('parts', [
+        'ID', 'Название', 'Цена', 'Поставка', 'Дата поставки', 'Поставщик', 'Заказ',
+    ], stmt)
+
+
+def attach_parts(order_id, requested):
+    """Приводит набор запчастей заказа к requested ({part_id: цена}) набором
+    UPDATE-запросов вместо загрузки и сохранения каждой запчасти.
+
+    Блокируются только затронутые строки (SELECT ... FOR UPDATE SKIP LOCKED),
+    поэтому два админа не могут одновременно установить одну запчасть склада.
+    Возвращает False, если какая-то запчасть уже занята; откат за вызывающим.
+    """
+    available = or_(Part.work_order_id.is_(None), Part.work_order_id == order_id)
+    # Остатки каталога: запчасти заказа до изменений и запрошенные
+    current = db.session.scalars(select(Part.part_id).where(Part.work_order_id == order_id)).all()
+    stock_tracker = catalog.track_parts(set(current) | set(requested))
+    if requested:
+        locked = db.session.execute(
+            select(Part.part_id)
+            .where(Part.part_id.in_(requested), available)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if len(locked) != len(requested):
+            return False
+
+    # Запчасти, убранные из заказа, возвращаются на склад
+    detach = update(Part).where(Part.work_order_id == order_id)
+    if requested:
+        detach = detach.where(Part.part_id.not_in(requested))
+    db.session.execute(detach.values(work_order_id=None))
+
+    if requested:
+        # Повторная проверка доступности в самом UPDATE (для СУБД без FOR UPDATE)
+        attached = db.session.execute(
+            update(Part).where(Part.part_id.in_(requested), available).values(work_order_id=order_id)
+        )
+        if attached.rowcount != len(requested):
+            return False
+        # Цены одним executemany
+        db.session.execute(update(Part), [{'part_id': part_id, 'price': price} for part_id, price in requested.items()])
+    stock_tracker.apply()
+    # Пакетные UPDATE идут мимо flush: дни заказа в сводках отчетов отмечаем сами
+    reports.mark_orders_dirty([order_id])
+    return True
 
 
 @admin_bp.route('/order/manage', methods=['GET', 'POST'], endpoint='add_order_admin')
@@ -183,6 +453,10 @@ def manage_order(id=None):
                 flash('Модель телефона обязательна.', 'danger')
                 return redirect(request.url)
 
+            # Снимок вклада заказа в статистику админ-панели до изменений
+            stats_tracker = dashboard.track_orders(order)
+            old_status = order.status
+
             # Маппинг данных из формы в объект заказа
             order.client_id = int(request.form['client_id'])
             order.phone_model = request.form['phone_model']
@@ -202,24 +476,32 @@ def manage_order(id=None):
             # Генерация ID заказа без фиксации транзакции
             db.session.flush()
             
-            # Если редактируем, временно возвращаем все запчасти заказа на склад
-            if id: 
-                current_parts = Part.query.filter_by(work_order_id=order.work_order_id).all()
-                for part in current_parts:
-                    part.work_order_id = None
-                
-            # Списки ID и цен запчастей из динамической формы
+            # Списки ID и цен запчастей из динамической формы: part_id -> цена
             part_ids = request.form.getlist('part_id[]')
             part_prices = request.form.getlist('part_price[]')
+            requested = {int(p_id): Decimal(p_price) for p_id, p_price in zip(part_ids, part_prices) if p_id and p_price}
+
+            if not attach_parts(order.work_order_id, requested):
+                db.session.rollback()
+                flash('Часть выбранных запчастей уже занята другим заказом. Обновите форму и выберите снова.', 'danger')
+                return redirect(request.url)
 
-            # Привязка выбранных запчастей к заказу с обновлением цены
-            for p_id, p_price in zip(part_ids, part_prices):
-                if p_id and p_price:
-                    part = Part.query.get(int(p_id))
-                    if part:
-                        part.work_order_id = order.work_order_id
-                        part.price = Decimal(p_price)
+            # Запчасти по виду и количеству: самые старые свободные экземпляры (FIFO)
+            alloc_items = request.form.getlist('alloc_item[]')
+            alloc_qty = request.form.getlist('alloc_qty[]')
+            try:
+                for item_id, quantity in zip(alloc_items, alloc_qty):
+                    if item_id and quantity:
+                        allocation.allocate_item(order.work_order_id, int(item_id), int(quantity))
+            except allocation.InsufficientStock as error:
+                db.session.rollback()
+                flash(f'Недостаточно запчастей "{error.name}" на складе: запрошено {error.requested}, '
+                      f'свободно {error.available}.', 'danger')
+                return redirect(request.url)
             
+            stats_tracker.apply()
+            notifications.order_status_changed(order, old_status)
+
             # Финальное сохранение всех изменений одним блоком
             db.session.commit()
             
@@ -231,19 +513,62 @@ def manage_order(id=None):
             db.session.rollback()
             flash('Ошибка сохранения заказа. Проверьте форматы данных.', 'danger')
 
-    # Загрузка клиентов и доступных запчастей (склад + текущие в заказе)
-    clients = Client.query.order_by(Client.last_name).all()
-
-    if id:
-        available_parts = Part.query.filter(or_(Part.work_order_id.is_(None), Part.work_order_id == id)).all()
-    else:
-        available_parts = Part.query.filter(Part.work_order_id.is_(None)).all()
-        
-    # Константы для отображения формы
+    # Клиенты и запчасти склада подгружаются формой через lookup_clients/lookup_parts,
+    # в саму страницу попадают только выбранные в заказе значения
     statuses = ['Принят', 'В ремонте', 'Ожидает запчасти', 'Готов к выдаче', 'Выдан', 'Отменен']
     title = "Новый заказ" if not id else f"Редактировать заказ №{order.work_order_id}"
     today = date.today().strftime('%Y-%m-%d')
-    return render_template('forms/order_form.html', order=order, clients=clients, available_parts=available_parts, statuses=statuses, title=title, submit_text="Сохранить", today=today)
+    return render_template('forms/order_form.html', order=order, statuses=statuses, title=title, submit_text="Сохранить", today=today)
+
+
+@admin_bp.route('/lookup/clients', methods=['GET'], endpoint='lookup_clients')
+@admin_required
+def lookup_clients():
+    # Постраничный список клиентов для автодополнения в форме заказа
+    search_query = request.args.get('q', '').strip()
+    clients_q = Client.query
+    if search_query:
+        clients_q = clients_q.filter(search_condition(search_query, Client.last_name, Client.first_name, Client.phone))
+    page = keyset_paginate(clients_q, (Client.last_name, Client.client_id), descending=False, per_page=LOOKUP_PAGE_SIZE)
+    return jsonify(
+        items=[{'id': client.client_id, 'text': f'{client.full_name} ({client.phone or ""})'} for client in page],
+        next=page.next_cursor,
+    )
+
+
+@admin_bp.route('/lookup/parts', methods=['GET'], endpoint='lookup_parts')
+@admin_required
+def lookup_parts():
+    # Свободные запчасти склада (и уже установленные в order_id) для формы заказа
+    search_query = request.args.get('q', '').strip()
+    order_id = request.args.get('order_id', type=int)
+    if order_id:
+        parts_q = Part.query.filter(or_(Part.work_order_id.is_(None), Part.work_order_id == order_id))
+    else:
+        parts_q = Part.query.filter(Part.work_order_id.is_(None))
+    if search_query:
+        parts_q = parts_q.filter(search_condition(search_query, Part.name))
+    page = keyset_paginate(parts_q, (Part.name, Part.part_id), descending=False, per_page=LOOKUP_PAGE_SIZE)
+    rubles = current_app.jinja_env.filters['rubles']
+    return jsonify(
+        items=[{'id': part.part_id, 'text': f'{part.name} - {rubles(part.price)}', 'price': str(part.price)} for part in page],
+        next=page.next_cursor,
+    )
+
+
+@admin_bp.route('/lookup/catalog', methods=['GET'], endpoint='lookup_catalog')
+@admin_required
+def lookup_catalog():
+    # Виды запчастей с остатком на складе для выдачи по количеству
+    search_query = request.args.get('q', '').strip()
+    items_q = CatalogItem.query.filter(CatalogItem.stock > 0)
+    if search_query:
+        items_q = items_q.filter(search_condition(search_query, CatalogItem.name, CatalogItem.sku))
+    page = keyset_paginate(items_q, (CatalogItem.name,), descending=False, per_page=LOOKUP_PAGE_SIZE)
+    return jsonify(
+        items=[{'id': item.catalog_item_id, 'text': f'{item.name} - свободно {item.stock}'} for item in page],
+        next=page.next_cursor,
+    )
 
 
 @admin_bp.route('/order/<int:id>/delete', methods=['POST'], endpoint='delete_order')
@@ -251,7 +576,9 @@ def manage_order(id=None):
 def delete_order(id):
     order = WorkOrder.query.get_or_404(id)
     try:
-        db.session.delete(order)
+        # Запчасти заказа возвращаются на склад
+        with dashboard.track_orders(order), catalog.track_parts([part.part_id for part in order.parts]):
+            db.session.delete(order)
         db.session.commit()
         flash(f'Заказ №{order.work_order_id} удален.', 'warning')
     except Exception:
@@ -268,7 +595,11 @@ def change_order_status(id):
     try:
         idx = statuses.index(order.status) if order.status in statuses else 0
         if idx < len(statuses) - 1:
-            order.status = statuses[idx + 1]
+            old_status = order.status
+            with dashboard.track_orders(order):
+                order.status = statuses[idx + 1]
+            # Уведомление клиента отправит воркер фоновых задач
+            notifications.order_status_changed(order, old_status)
             db.session.commit()
             flash(f'Статус заказа №{order.work_order_id} изменён на "{order.status}"', 'success')
         else:
@@ -281,13 +612,16 @@ def change_order_status(id):
 
 @admin_bp.route('/parts', methods=['GET'], endpoint='admin_parts')
 @admin_required
+@read_replica
+@conditional_get(PART_LIST_TABLES)
 def admin_parts():
     search_query = request.args.get('q', '').strip()
-    parts_q = Part.query.order_by(Part.part_id.desc())
+    parts_q = Part.query.options(*PART_LIST_LOAD)
     if search_query:
-        search = f'%{search_query}%'
-        parts_q = parts_q.filter(Part.name.ilike(search))
-    return render_template('admin/admin_parts.html', parts=parts_q.all(), search_query=search_query)
+        parts_q = parts_q.filter(search_condition(search_query, Part.name))
+    table = cache.cached_fragment(PART_LIST_TABLES, lambda: render_template(
+        'admin/_parts_table.html', parts=keyset_paginate(parts_q, (Part.part_id,))))
+    return render_template('admin/admin_parts.html', table=table, search_query=search_query)
 
 
 @admin_bp.route('/part/manage', methods=['GET', 'POST'], endpoint='add_part')
@@ -297,11 +631,16 @@ def manage_part(id=None):
     part = Part.query.get_or_404(id) if id else Part()
     if request.method == 'POST':
         try:
-            part.name = request.form.get('name', '').strip()
-            part.price = Decimal(request.form.get('price', part.price or '0.00')) if request.form.get('price') else part.price
-            part.supply_id = int(request.form.get('supply_id', 0))
-            if not id:
-                db.session.add(part)
+            # Название и цена установленной запчасти входят в статистику заказа
+            stock_tracker = catalog.track_parts([id] if id else [])
+            with dashboard.track_orders(*([part.order] if part.order else [])):
+                part.name = request.form.get('name', '').strip()
+                part.price = Decimal(request.form.get('price', part.price or '0.00')) if request.form.get('price') else part.price
+                part.supply_id = int(request.form.get('supply_id', 0))
+                if not id:
+                    db.session.add(part)
+            stock_tracker.add([part.part_id])
+            stock_tracker.apply()
             db.session.commit()
             flash(f'Запчасть "{part.name}" сохранена.', 'success')
             return redirect(url_for('admin_bp.admin_parts'))
@@ -319,7 +658,9 @@ def manage_part(id=None):
 def delete_part(id):
     part = Part.query.get_or_404(id)
     try:
-        db.session.delete(part)
+        with catalog.track_parts([part.part_id]):
+            with dashboard.track_orders(*([part.order] if part.order else [])):
+                db.session.delete(part)
         db.session.commit()
         flash(f'Запчасть "{part.name}" удалена.', 'warning')
     except Exception:
@@ -328,15 +669,51 @@ def delete_part(id):
     return redirect(url_for('admin_bp.admin_parts'))
 
 
+@admin_bp.route('/catalog', methods=['GET'], endpoint='admin_catalog')
+@admin_required
+@read_replica
+@conditional_get(CATALOG_TABLES)
+def admin_catalog():
+    # Остатки по видам запчастей читаются из счетчиков каталога (app/catalog.py)
+    search_query = request.args.get('q', '').strip()
+    low_only = request.args.get('low') == '1'
+    items_q = CatalogItem.query
+    if search_query:
+        items_q = items_q.filter(search_condition(search_query, CatalogItem.name, CatalogItem.sku))
+    if low_only:
+        items_q = items_q.filter(CatalogItem.stock < CatalogItem.min_stock)
+    items = keyset_paginate(items_q, (CatalogItem.name,), descending=False)
+    return render_template('admin/admin_catalog.html', items=items, search_query=search_query, low_only=low_only)
+
+
+@admin_bp.route('/catalog/<int:id>', methods=['POST'], endpoint='edit_catalog_item')
+@admin_required
+def edit_catalog_item(id):
+    item = CatalogItem.query.get_or_404(id)
+    try:
+        item.sku = request.form.get('sku', '').strip() or None
+        item.min_stock = max(int(request.form.get('min_stock') or 0), 0)
+        db.session.commit()
+        flash(f'Вид запчасти "{item.name}" сохранен.', 'success')
+    except Exception:
+        db.session.rollback()
+        flash('Ошибка сохранения. Артикул должен быть уникальным, минимум - целым числом.', 'danger')
+    return redirect(request.referrer or url_for('admin_bp.admin_catalog'))
+
+
 @admin_bp.route('/suppliers', methods=['GET'], endpoint='admin_suppliers')
 @admin_required
+@read_replica
+@conditional_get(SUPPLIER_LIST_TABLES)
 def admin_suppliers():
     search_query = request.args.get('q', '').strip()
-    suppliers_q = Supplier.query.order_by(Supplier.name)
+    suppliers_q = Supplier.query.options(*SUPPLIER_LIST_LOAD)
     if search_query:
-        search = f'%{search_query}%'
-        suppliers_q = suppliers_q.filter(Supplier.name.ilike(search))
-    return render_template('admin/admin_suppliers.html', suppliers=suppliers_q.all(), search_query=search_query)
+        suppliers_q = suppliers_q.filter(search_condition(search_query, Supplier.name))
+    table = cache.cached_fragment(SUPPLIER_LIST_TABLES, lambda: render_template(
+        'admin/_suppliers_table.html',
+        suppliers=keyset_paginate(suppliers_q, (Supplier.name,), descending=False)))
+    return render_template('admin/admin_suppliers.html', table=table, search_query=search_query)
 
 
 @admin_bp.route('/supplier/manage', methods=['GET', 'POST'], endpoint='add_supplier')
@@ -380,18 +757,20 @@ def delete_supplier(id):
 
 @admin_bp.route('/supplies', methods=['GET'], endpoint='admin_supplies')
 @admin_required
+@read_replica
+@conditional_get(SUPPLY_LIST_TABLES)
 def admin_supplies():
     search_query = request.args.get('q', '').strip()
     date_filter = request.args.get('date', '').strip()
     
-    supplies_q = Supply.query.join(Supplier).order_by(Supply.supply_date.desc())
+    supplies_q = Supply.query.join(Supplier).options(*SUPPLY_LIST_LOAD)
     
     if search_query:
-        search = f'%{search_query}%'
+        # EXISTS вместо OUTER JOIN: поставка не дублируется по числу найденных запчастей
         supplies_q = supplies_q.filter(or_(
-            Supplier.name.ilike(search),
-            Part.name.ilike(search)
-        )).outerjoin(Part, Supply.supply_id == Part.supply_id)
+            search_condition(search_query, Supplier.name),
+            Supply.parts.any(search_condition(search_query, Part.name))
+        ))
     
     if date_filter:
         try:
@@ -400,10 +779,62 @@ def admin_supplies():
         except ValueError:
             pass
     
-    return render_template('admin/admin_supplies.html', supplies=supplies_q.all(), search_query=search_query, 
+    table = cache.cached_fragment(SUPPLY_LIST_TABLES, lambda: render_template(
+        'admin/_supplies_table.html',
+        supplies=keyset_paginate(supplies_q, (Supply.supply_date, Supply.supply_id))))
+    return render_template('admin/admin_supplies.html', table=table, search_query=search_query, 
                           date_filter=date_filter)
 
 
+def sync_supply_parts(supply_id, rows):
+    """Приводит запчасти поставки к строкам формы rows [(part_id | None, название, цена)].
+
+    Вместо удаления и повторной вставки всех запчастей считается разница с
+    текущими строками и выполняются только нужные INSERT/UPDATE/DELETE
+    (по одному пакетному запросу на вид). Неизмененные запчасти сохраняют
+    свои part_id и привязку к заказам.
+    """
+    existing = {
+        row.part_id: row
+        for row in db.session.query(Part.part_id, Part.name, Part.price, Part.work_order_id)
+        .filter(Part.supply_id == supply_id)
+    }
+
+    inserts, updates, kept = [], [], set()
+    for part_id, name, price in rows:
+        if part_id is None:
+            inserts.append({'name': name, 'price': price, 'supply_id': supply_id, 'work_order_id': None})
+        elif part_id in existing and part_id not in kept:
+            kept.add(part_id)
+            current = existing[part_id]
+            if current.name != name or current.price != price:
+                updates.append({'part_id': part_id, 'name': name, 'price': price})
+    deletes = [part_id for part_id in existing if part_id not in kept]
+
+    # Изменение установленных в заказы запчастей меняет статистику этих заказов
+    changed = deletes + [row['part_id'] for row in updates]
+    affected_orders = {existing[part_id].work_order_id for part_id in changed} - {None}
+    stats_tracker = dashboard.track_orders(
+        *WorkOrder.query.filter(WorkOrder.work_order_id.in_(affected_orders)).all()
+    ) if affected_orders else None
+    stock_tracker = catalog.track_parts(changed)
+
+    if deletes:
+        db.session.execute(delete(Part).where(Part.part_id.in_(deletes)))
+    if updates:
+        db.session.execute(update(Part), updates)
+    inserted = db.session.scalars(insert(Part).returning(Part.part_id), inserts).all() if inserts else []
+
+    # Пакетные запросы идут в обход ORM, индекс общего поиска обновляем сами
+    renamed = [row['part_id'] for row in updates if existing[row['part_id']].name != row['name']]
+    search.reindex('parts', deletes + renamed + list(inserted))
+    if stats_tracker:
+        stats_tracker.apply()
+    stock_tracker.add(inserted)
+    stock_tracker.apply()
+    reports.mark_orders_dirty(affected_orders)
+
+
 @admin_bp.route('/supply/manage', methods=['GET', 'POST'], endpoint='add_supply')
 @admin_bp.route('/supply/manage/<int:id>', methods=['GET', 'POST'], endpoint='edit_supply')
 @admin_required
@@ -416,36 +847,32 @@ def manage_supply(id=None):
             if not date_str:
                 flash('Дата поставки обязательна.', 'danger')
                 return redirect(request.url)
+
+            # Строки формы: скрытый part_id (пустой у новых строк), название и цена.
+            # Списки разной длины не сопоставить со строками: сохранение удалило бы
+            # запчасти поставки, в том числе установленные в заказы.
+            part_ids = request.form.getlist('part_id[]')
+            part_names = request.form.getlist('part_name[]')
+            part_prices = request.form.getlist('part_price[]')
+            if not len(part_ids) == len(part_names) == len(part_prices):
+                flash('Ошибка формы: список запчастей поврежден, поставка не сохранена.', 'danger')
+                return redirect(request.url)
             
             supply.supplier_id = int(request.form['supplier_id'])
             supply.supply_date = datetime.strptime(date_str, '%Y-%m-%d').date()
             supply.details = request.form.get('details', '').strip()
             
-            # Если редактируем существующую поставку, удаляем старые запчасти
-            if id:
-                for part in supply.parts.all():
-                    db.session.delete(part)
-            
             if not id:
                 db.session.add(supply)
             
             db.session.flush() 
             
-            part_names = request.form.getlist('part_name[]')
-            part_prices = request.form.getlist('part_price[]')
-            
-            for part_name, part_price in zip(part_names, part_prices):
-                if part_name.strip() and part_price:
-                    try:
-                        new_part = Part(
-                            name=part_name.strip(),
-                            price=Decimal(part_price),
-                            supply_id=supply.supply_id,
-                            work_order_id=None
-                        )
-                        db.session.add(new_part)
-                    except (ValueError, TypeError):
-                        pass
+            rows = [
+                (int(part_id) if part_id else None, part_name.strip(), Decimal(part_price))
+                for part_id, part_name, part_price in zip(part_ids, part_names, part_prices)
+                if part_name.strip() and part_price
+            ]
+            sync_supply_parts(supply.supply_id, rows)
             
             db.session.commit()
             flash(f'Поставка №{supply.supply_id} сохранена.', 'success')
@@ -466,7 +893,8 @@ def manage_supply(id=None):
 def delete_supply(id):
     supply = Supply.query.get_or_404(id)
     try:
-        db.session.delete(supply)
+        with dashboard.track_orders(*{part.order for part in supply.parts if part.order}):
+            db.session.delete(supply)
         db.session.commit()
         flash(f'Поставка №{supply.supply_id} удалена.', 'warning')
     except Exception:
@@ -475,23 +903,52 @@ def delete_supply(id):
     return redirect(url_for('admin_bp.admin_supplies'))
 
 
+@admin_bp.route('/supplies/import', methods=['GET', 'POST'], endpoint='import_supplies')
+@admin_required
+def import_supplies():
+    result = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Выберите файл для импорта.', 'danger')
+            return redirect(request.url)
+        dry_run = bool(request.form.get('dry_run'))
+        try:
+            result = importer.import_supplies(importer.read_rows(upload.stream, upload.filename), dry_run=dry_run)
+        except importer.ImportFileError as e:
+            flash(str(e), 'danger')
+            return redirect(request.url)
+        except Exception as e:
+            flash(f'Ошибка импорта: {str(e)}', 'danger')
+            return redirect(request.url)
+        if dry_run:
+            flash(f'Проверено строк: {result.rows_total}, ошибок: {result.error_count}.', 'info')
+        else:
+            flash(f'Импортировано запчастей: {result.parts_created}, поставок: {result.supplies_created}.', 'success')
+    return render_template('forms/supply_import.html', result=result, title='Импорт поставок')
+
+
 @admin_bp.route('/users', methods=['GET'], endpoint='admin_users')
 @admin_required
+@read_replica
+@conditional_get(USER_LIST_TABLES)
 def admin_users():
     search_query = request.args.get('q', '').strip()
     date_filter = request.args.get('date', '').strip()
-    users_q = User.query.order_by(desc(User.created_at))
+    users_q = User.query.options(*USER_LIST_LOAD)
     
     if search_query:
-        search = f'%{search_query}%'
+        matching_clients = db.select(Client.client_id)\
+            .where(search_condition(search_query, Client.last_name))
         users_q = users_q.filter(or_(
-            User.email.ilike(search), 
-            Client.last_name.ilike(search)
-        )).outerjoin(Client, User.client_id == Client.client_id)
+            search_condition(search_query, User.email),
+            User.client_id.in_(matching_clients)
+        ))
     if date_filter:
         try:
             date_obj = datetime.strptime(date_filter, '%Y-%m-%d').date()
             users_q = users_q.filter(User.created_at >= date_obj).filter(User.created_at < date_obj + datetime.timedelta(days=1))
         except ValueError:
             pass
-    return render_template('admin/admin_users.html', users=users_q.all(), search_query=search_query, date_filter=date_filter)
+    users = keyset_paginate(users_q, (User.created_at, User.user_account_id))
+    return render_template('admin/admin_users.html', users=users, search_query=search_query, date_filter=date_filter)
@@ -1,7 +1,13 @@
+import math
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from app import db
 from app.models import User, Client, Role
+from sqlalchemy.orm import joinedload
 from app.decorators import login_required
+from app.sessions import login_user
+from app.passwords import PasswordCheckBusy
+from app import dashboard
+from app import ratelimit
 
 auth_bp = Blueprint('auth_bp', __name__)
 
@@ -39,6 +45,7 @@ def register():
             user.set_password(password)
             
             db.session.add(user)
+            dashboard.client_added()
             db.session.commit()
             flash('Регистрация успешна! Войдите в систему.', 'success')
             return redirect(url_for('auth_bp.login'))
@@ -58,13 +65,32 @@ def login():
     if request.method == 'POST':
         email = request.form.get('email')
         password = request.form.get('password')
-        user = User.query.filter_by(email=email).first()
 
-        if user and user.check_password(password):
-            session['user_id'] = user.user_account_id 
-            session['role'] = user.role
-            session['client_id'] = user.client_id
-            session['email'] = user.email
+        # До обращения к базе и проверки пароля
+        retry_after = ratelimit.check_login(request.remote_addr, email)
+        if retry_after is not None:
+            flash(f'Слишком много попыток входа. Повторите через {math.ceil(retry_after)} с.', 'danger')
+            return render_template('auth/login.html'), 429, {'Retry-After': str(math.ceil(retry_after))}
+
+        # Роль и клиент нужны сразу (сессия, приветствие) - загружаем одним запросом
+        user = User.query.options(joinedload(User.role_obj), joinedload(User.client))\
+            .filter_by(email=email).first()
+
+        try:
+            password_ok = user is not None and user.check_password(password)
+        except PasswordCheckBusy:
+            flash('Сервер перегружен, попробуйте войти через несколько секунд.', 'warning')
+            return render_template('auth/login.html'), 503
+
+        if password_ok:
+            if user.password_needs_rehash():
+                try:
+                    user.set_password(password)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+            ratelimit.login_succeeded(email)
+            login_user(user)
 
             flash(f'Добро пожаловать, {user.display_name}!', 'success')
             
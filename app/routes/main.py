@@ -1,14 +1,23 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from app import db
-from app.models import User, Client, WorkOrder, Part
+from app.models import User, Client, WorkOrder
 from functools import wraps
 from datetime import datetime
 from decimal import Decimal
+from sqlalchemy.orm import undefer
 from app.decorators import login_required
+from app.passwords import PasswordCheckBusy
+from app.pagination import keyset_paginate
+from app import dashboard
+from app.http_cache import conditional_get
 
 main_bp = Blueprint('main_bp', __name__)
 
+# Таблицы, от которых зависят страницы клиента (ETag, app/http_cache.py)
+CLIENT_ORDER_TABLES = ('client', 'work_order', 'part')
+
 @main_bp.route('/', endpoint='index')
+@conditional_get(CLIENT_ORDER_TABLES)
 def index():
     
     if session.get('role') == 'admin':
@@ -16,7 +25,9 @@ def index():
     
     if session.get('client_id'):
         client = Client.query.get(session['client_id'])
-        orders = client.orders.order_by(WorkOrder.received_date.desc()).all()
+        orders_q = WorkOrder.query.filter_by(client_id=client.client_id)\
+            .options(undefer(WorkOrder.parts_total))
+        orders = keyset_paginate(orders_q, (WorkOrder.received_date, WorkOrder.work_order_id))
         return render_template('client_index.html', client=client, orders=orders)
     return render_template('public_index.html')
 
@@ -44,7 +55,13 @@ def profile():
         old_password = request.form.get('old_password')
         new_password = request.form.get('new_password')
 
-        if not user.check_password(old_password):
+        try:
+            password_ok = user.check_password(old_password)
+        except PasswordCheckBusy:
+            flash('Сервер перегружен, попробуйте через несколько секунд.', 'warning')
+            return redirect(url_for('main_bp.profile'))
+
+        if not password_ok:
             flash('Неверный текущий пароль.', 'danger')
         else:
             user.set_password(new_password)
@@ -53,11 +70,15 @@ def profile():
         return redirect(url_for('main_bp.profile'))
 
     client = Client.query.get(user.client_id) if user.client_id else None
-    return render_template('profile.html', user=user, client=client)
+    orders = WorkOrder.query.filter_by(client_id=client.client_id)\
+        .options(undefer(WorkOrder.parts_total))\
+        .order_by(WorkOrder.received_date.desc()).all() if client else []
+    return render_template('profile.html', user=user, client=client, orders=orders)
 
 
 @main_bp.route('/order/<int:id>', endpoint='order_details')
 @login_required
+@conditional_get(CLIENT_ORDER_TABLES)
 def order_details(id):
     order = WorkOrder.query.get_or_404(id)
     if session.get('role') != 'admin' and order.client_id != session.get('client_id'):
@@ -85,14 +106,10 @@ def add_order():
 
         if not phone_model:
             flash('Модель телефона обязательна.', 'danger')
-            clients = Client.query.order_by(Client.last_name).all() if session.get('role') == 'admin' else []
-            available_parts = Part.query.filter(Part.work_order_id.is_(None)).all() if session.get('role') == 'admin' else []
             today = datetime.today().strftime('%Y-%m-%d')
             return render_template(
                 'forms/order_form.html',
                 order=None,
-                clients=clients,
-                available_parts=available_parts,
                 statuses=['Принят', 'В ремонте', 'Ожидает запчасти', 'Готов к выдаче', 'Выдан', 'Отменен'],
                 title="Новый заказ",
                 submit_text="Сохранить",
@@ -103,7 +120,8 @@ def add_order():
                           received_date=received_date, status=status, work_cost=work_cost,
                           client_id=client_id)
         try:
-            db.session.add(order)
+            with dashboard.track_orders(order):
+                db.session.add(order)
             db.session.commit()
             flash('Заказ создан.', 'success')
             if session.get('role') == 'client':
@@ -113,14 +131,11 @@ def add_order():
             db.session.rollback()
             flash('Ошибка создания заказа.', 'danger')
 
-    clients = Client.query.order_by(Client.last_name).all() if session.get('role') == 'admin' else []
-    available_parts = Part.query.filter(Part.work_order_id.is_(None)).all() if session.get('role') == 'admin' else []
+    # Клиенты и запчасти для админа подгружаются формой через JSON (admin_bp.lookup_*)
     today = datetime.today().strftime('%Y-%m-%d')
     return render_template(
         'forms/order_form.html',
         order=None,
-        clients=clients,
-        available_parts=available_parts,
         statuses=['Принят', 'В ремонте', 'Ожидает запчасти', 'Готов к выдаче', 'Выдан', 'Отменен'],
         title="Новый заказ",
         submit_text="Сохранить",
@@ -138,7 +153,8 @@ def cancel_order(id):
         flash('Отменить можно только заказ со статусом "Принят".', 'danger')
     else:
         try:
-            order.status = 'Отменен'
+            with dashboard.track_orders(order):
+                order.status = 'Отменен'
             db.session.commit()
             flash(f'Заказ №{order.work_order_id} отменен.', 'info')
         except Exception:
@@ -0,0 +1,318 @@
+import re
+import click
+from flask import url_for
+from flask.cli import AppGroup
+from sqlalchemy import or_, text, event, select, delete, insert, exists, inspect
+from sqlalchemy.orm import Session, aliased
+from app import db
+from app.models import Client, WorkOrder, Part, Supplier, SearchDocument, SearchToken
+
+# Поиск в админ-разделах. Запросы вида ILIKE '%q%' не используют B-tree
+# индексы, поэтому для Postgres строятся GIN-индексы pg_trgm по искомым
+# колонкам: с ними тот же ILIKE идет по индексу. Для SQLite (тестовые базы)
+# остается обычный LIKE без дополнительных индексов.
+
+# Колонки, по которым ищут админ-разделы: (таблица, колонка)
+SEARCH_COLUMNS = (
+    ('client', 'last_name'),
+    ('client', 'first_name'),
+    ('client', 'phone'),
+    ('work_order', 'phone_model'),
+    ('part', 'name'),
+    ('supplier', 'name'),
+    ('user_account', 'email'),
+)
+
+
+class LikeSearchBackend:
+    # Резервная реализация: подстрочный поиск без учета регистра
+
+    name = 'like'
+
+    def condition(self, query_text, *columns):
+        return or_(*[column.icontains(query_text, autoescape=True) for column in columns])
+
+    def install(self):
+        return []
+
+
+class PostgresTrigramBackend(LikeSearchBackend):
+    # ILIKE по колонкам с GIN-индексами gin_trgm_ops
+
+    name = 'pg_trgm'
+
+    def install(self):
+        created = []
+        db.session.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        for table, column in SEARCH_COLUMNS:
+            index_name = f'ix_{table}_{column}_trgm'
+            db.session.execute(text(
+                f'CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING gin ({column} gin_trgm_ops)'
+            ))
+            created.append(index_name)
+        # Префиксный поиск общего поиска (есть в новых базах, для старых создаем здесь)
+        db.session.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_search_token_prefix ON search_token (entity, token text_pattern_ops)'
+        ))
+        created.append('ix_search_token_prefix')
+        db.session.commit()
+        return created
+
+
+def get_backend():
+    if db.engine.dialect.name == 'postgresql':
+        return PostgresTrigramBackend()
+    return LikeSearchBackend()
+
+
+def search_condition(query_text, *columns):
+    """Условие "query_text встречается в любой из колонок" для фильтра:
+
+        clients_q.filter(search_condition(q, Client.last_name, Client.first_name))
+    """
+    return get_backend().condition(query_text, *columns)
+
+
+# --- Общий поиск (/admin/search) ---
+# Для каждого клиента, заказа, запчасти и поставщика храним карточку
+# (search_document) и набор слов в нижнем регистре (search_token). Индекс
+# обновляется после каждого flush ORM; массовые операции в обход ORM должны
+# вызывать reindex() сами. Поиск идет по префиксам слов (_prefix_condition):
+# в Postgres - token LIKE 'q%' по индексу text_pattern_ops, который верен при
+# любой сортировке базы (ru_RU, en_US, ICU); в SQLite строки сравниваются по
+# кодам символов, и диапазон token >= 'q' AND token < 'r' идет по первичному ключу.
+
+TOKEN_RE = re.compile(r'\w+')
+MIN_QUERY_LENGTH = 2
+DEFAULT_LIMIT = 5
+MAX_LIMIT = 20
+
+
+def _tokens(*values):
+    tokens = set()
+    for value in values:
+        if not value:
+            continue
+        value = str(value).lower().replace('ё', 'е')
+        tokens.update(token[:100] for token in TOKEN_RE.findall(value))
+    return tokens
+
+
+def _digits(value):
+    # Телефон одним словом из цифр: "+375 (29) 123-45-67" находится по "37529123"
+    return re.sub(r'\D', '', value or '')
+
+
+def _client_doc(client):
+    return (client.full_name, client.phone or '',
+            _tokens(client.last_name, client.first_name, client.middle_name, client.phone, _digits(client.phone)))
+
+
+def _order_doc(order):
+    return (f'№{order.work_order_id} {order.phone_model}', order.status or '',
+            _tokens(order.work_order_id, order.phone_model))
+
+
+def _part_doc(part):
+    return (part.name, f'Поставка №{part.supply_id}', _tokens(part.part_id, part.name))
+
+
+def _supplier_doc(supplier):
+    return (supplier.name, (supplier.contacts or '')[:255], _tokens(supplier.name))
+
+
+# Сущность -> (модель, поля, влияющие на карточку, функция карточки, endpoint страницы объекта)
+INDEXED = {
+    'clients': (Client, ('last_name', 'first_name', 'middle_name', 'phone'), _client_doc, 'admin_bp.edit_client'),
+    'orders': (WorkOrder, ('phone_model', 'status'), _order_doc, 'main_bp.order_details'),
+    'parts': (Part, ('name', 'supply_id'), _part_doc, 'admin_bp.edit_part'),
+    'suppliers': (Supplier, ('name', 'contacts'), _supplier_doc, 'admin_bp.edit_supplier'),
+}
+_ENTITY_BY_MODEL = {model: entity for entity, (model, *_rest) in INDEXED.items()}
+
+
+def _entity_id(obj):
+    return inspect(obj).mapper.primary_key_from_instance(obj)[0]
+
+
+def _write(connection, entity, objects, removed_ids=()):
+    _, _, make_doc, _ = INDEXED[entity]
+    docs = {_entity_id(obj): make_doc(obj) for obj in objects}
+    ids = list(docs) + list(removed_ids)
+    if not ids:
+        return
+    connection.execute(delete(SearchToken).where(SearchToken.entity == entity, SearchToken.entity_id.in_(ids)))
+    connection.execute(delete(SearchDocument).where(SearchDocument.entity == entity, SearchDocument.entity_id.in_(ids)))
+    if docs:
+        connection.execute(insert(SearchDocument), [
+            {'entity': entity, 'entity_id': entity_id, 'title': title[:255], 'subtitle': subtitle[:255]}
+            for entity_id, (title, subtitle, _) in docs.items()
+        ])
+        token_rows = [
+            {'entity': entity, 'entity_id': entity_id, 'token': token}
+            for entity_id, (_, _, tokens) in docs.items() for token in tokens
+        ]
+        if token_rows:
+            connection.execute(insert(SearchToken), token_rows)
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_after_flush(session, flush_context):
+    changed, removed = {}, {}
+    for obj in session.new:
+        entity = _ENTITY_BY_MODEL.get(type(obj))
+        if entity:
+            changed.setdefault(entity, []).append(obj)
+    for obj in session.dirty:
+        entity = _ENTITY_BY_MODEL.get(type(obj))
+        if entity:
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in INDEXED[entity][1]):
+                changed.setdefault(entity, []).append(obj)
+    for obj in session.deleted:
+        entity = _ENTITY_BY_MODEL.get(type(obj))
+        if entity:
+            removed.setdefault(entity, []).append(_entity_id(obj))
+
+    if changed or removed:
+        connection = session.connection()
+        for entity in set(changed) | set(removed):
+            _write(connection, entity, changed.get(entity, []), removed.get(entity, []))
+
+
+def index_objects(entity, objects):
+    # Карточки для объектов, вставленных в обход ORM (объекты могут быть несохраненными копиями)
+    _write(db.session.connection(), entity, objects)
+
+
+def reindex(entity, ids=None, batch_size=1000):
+    # Переиндексация объектов сущности (все, если ids не заданы); коммит за вызывающим
+    model = INDEXED[entity][0]
+    pk = inspect(model).primary_key[0]
+    query = model.query.order_by(pk)
+    if ids is not None:
+        ids = list(ids)
+        found = set()
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            objects = query.filter(pk.in_(chunk)).all()
+            found.update(_entity_id(obj) for obj in objects)
+            _write(db.session.connection(), entity, objects, [i for i in chunk if i not in found])
+        return
+
+    db.session.execute(delete(SearchToken).where(SearchToken.entity == entity))
+    db.session.execute(delete(SearchDocument).where(SearchDocument.entity == entity))
+    batch = []
+    for obj in query.yield_per(batch_size):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            _write(db.session.connection(), entity, batch)
+            batch = []
+    _write(db.session.connection(), entity, batch)
+
+
+def _prefix_end(word):
+    # Наименьшая строка больше всех строк с префиксом word (по кодам символов)
+    while word and ord(word[-1]) == 0x10FFFF:
+        word = word[:-1]
+    return word[:-1] + chr(ord(word[-1]) + 1) if word else None
+
+
+def _prefix_condition(column, word):
+    # Диапазон верен только при побайтовой сортировке: в SQLite она по умолчанию,
+    # в Postgres зависит от сортировки базы, поэтому там LIKE
+    if db.engine.dialect.name == 'sqlite':
+        end = _prefix_end(word)
+        return (column >= word) & (column < end) if end is not None else column >= word
+    # Шаблон целиком в параметре: планировщик видит константный префикс
+    pattern = word.replace('/', '//').replace('%', '/%').replace('_', '/_') + '%'
+    return column.like(pattern, escape='/')
+
+
+def _match_ids(entity, words, limit):
+    # Сначала точные совпадения самого длинного слова, затем совпадения по префиксу.
+    # Остальные слова запроса проверяются через EXISTS по тому же индексу.
+    driver = max(words, key=len)
+    others = [word for word in words if word != driver]
+
+    def base(condition, *order):
+        stmt = select(SearchToken.entity_id).where(SearchToken.entity == entity, condition)
+        for word in others:
+            other = aliased(SearchToken)
+            stmt = stmt.where(exists().where(
+                other.entity == entity,
+                other.entity_id == SearchToken.entity_id,
+                _prefix_condition(other.token, word),
+            ))
+        return stmt.order_by(*order)
+
+    ids = []
+    exact = base(SearchToken.token == driver, SearchToken.entity_id.desc()).limit(limit)
+    ids.extend(db.session.execute(exact).scalars())
+    if len(ids) < limit:
+        prefix = base(
+            _prefix_condition(SearchToken.token, driver) & (SearchToken.token != driver),
+            SearchToken.token, SearchToken.entity_id.desc(),
+        ).limit(limit * 2)
+        for entity_id in db.session.execute(prefix).scalars():
+            if entity_id not in ids:
+                ids.append(entity_id)
+            if len(ids) >= limit:
+                break
+    return ids
+
+
+def global_search(query_text, limit=DEFAULT_LIMIT):
+    """Результаты по всем сущностям: {'clients': [{'id', 'title', 'subtitle', 'url'}, ...], ...}"""
+    words = sorted(_tokens(query_text), key=len, reverse=True)[:5]
+    results = {entity: [] for entity in INDEXED}
+    if not words or len(' '.join(words)) < MIN_QUERY_LENGTH:
+        return results
+
+    matched = {entity: _match_ids(entity, words, limit) for entity in INDEXED}
+    pairs = [(entity, entity_id) for entity, ids in matched.items() for entity_id in ids]
+    if not pairs:
+        return results
+
+    docs = {
+        (doc.entity, doc.entity_id): doc
+        for doc in SearchDocument.query.filter(or_(*[
+            (SearchDocument.entity == entity) & SearchDocument.entity_id.in_(ids)
+            for entity, ids in matched.items() if ids
+        ]))
+    }
+    for entity, ids in matched.items():
+        endpoint = INDEXED[entity][3]
+        for entity_id in ids:
+            doc = docs.get((entity, entity_id))
+            if doc:
+                results[entity].append({
+                    'id': entity_id,
+                    'title': doc.title,
+                    'subtitle': doc.subtitle,
+                    'url': url_for(endpoint, id=entity_id),
+                })
+    return results
+
+
+search_cli = AppGroup('search', help='Поисковые индексы.')
+
+
+@search_cli.command('install')
+def install_command():
+    """Создать индексы для поиска (pg_trgm для Postgres)."""
+    backend = get_backend()
+    created = backend.install()
+    if created:
+        click.echo(f'Индексы {backend.name}: ' + ', '.join(created))
+    else:
+        click.echo(f'Бэкенд {backend.name} не требует индексов.')
+
+
+@search_cli.command('reindex')
+def reindex_command():
+    """Перестроить индекс общего поиска."""
+    for entity in INDEXED:
+        reindex(entity)
+        db.session.commit()
+        click.echo(f'{entity}: готово')
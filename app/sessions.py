@@ -0,0 +1,230 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from flask import g, session, current_app
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+# Сессии хранятся на сервере, в cookie лежит только случайный идентификатор.
+# Это позволяет сразу завершать сессии пользователя (смена роли, удаление),
+# а данные сессии (user_id, role, client_id, email) служат кэшем текущего
+# пользователя: декораторы доступа читают их без запросов к основной базе.
+#
+# Хранилище - любой объект с методами get/set/delete/delete_for_user
+# (см. SessionStore); так можно подключить, например, Redis.
+
+
+class SessionStore:
+    """Интерфейс хранилища сессий."""
+
+    def get(self, sid):
+        # dict данных или None, если сессии нет или она истекла
+        raise NotImplementedError
+
+    def set(self, sid, data, ttl):
+        raise NotImplementedError
+
+    def delete(self, sid):
+        raise NotImplementedError
+
+    def delete_for_user(self, user_id):
+        # Завершить все сессии пользователя; возвращает их число
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    # Для одного процесса (разработка, тесты)
+
+    PURGE_SIZE = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}  # sid -> (expires, user_id, data)
+
+    def get(self, sid):
+        with self._lock:
+            item = self._data.get(sid)
+            if item is None:
+                return None
+            if item[0] < time.time():
+                del self._data[sid]
+                return None
+            return dict(item[2])
+
+    def set(self, sid, data, ttl):
+        with self._lock:
+            now = time.time()
+            if len(self._data) >= self.PURGE_SIZE:
+                self._data = {key: item for key, item in self._data.items() if item[0] >= now}
+            self._data[sid] = (now + ttl, data.get('user_id'), dict(data))
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def delete_for_user(self, user_id):
+        with self._lock:
+            sids = [sid for sid, item in self._data.items() if item[1] == user_id]
+            for sid in sids:
+                del self._data[sid]
+            return len(sids)
+
+
+class SqliteSessionStore(SessionStore):
+    # Файл SQLite: общий для всех процессов на одной машине
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS session ('
+                         'sid TEXT PRIMARY KEY, user_id INTEGER, data TEXT NOT NULL, expires REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_session_user_id ON session (user_id)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid):
+        row = self._connect().execute(
+            'SELECT data FROM session WHERE sid = ? AND expires >= ?', (sid, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, sid, data, ttl):
+        conn = self._connect()
+        conn.execute('INSERT OR REPLACE INTO session (sid, user_id, data, expires) VALUES (?, ?, ?, ?)',
+                     (sid, data.get('user_id'), json.dumps(data), time.time() + ttl))
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute('DELETE FROM session WHERE expires < ?', (time.time(),))
+
+    def delete(self, sid):
+        self._connect().execute('DELETE FROM session WHERE sid = ?', (sid,))
+
+    def delete_for_user(self, user_id):
+        return self._connect().execute('DELETE FROM session WHERE user_id = ?', (user_id,)).rowcount
+
+
+class ServerSession(CallbackDict, SessionMixin):
+
+    def __init__(self, data=None, sid=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(data, on_update)
+        self.sid = sid
+        self.new = sid is None
+        self.modified = False
+        self.rotate = False
+
+    def regenerate(self):
+        # Новый идентификатор при входе (защита от фиксации сессии)
+        self.rotate = True
+        self.modified = True
+
+
+class ServerSessionInterface(SessionInterface):
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        data = self.store.get(sid) if sid else None
+        if data is None:
+            # Неизвестный идентификатор не принимаем: сессия начнется с новым sid
+            return ServerSession()
+        return ServerSession(data, sid)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.sid and session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not (session.modified or session.rotate or session.new):
+            return
+
+        if session.rotate and session.sid:
+            self.store.delete(session.sid)
+        elif session.sid and self.store.get(session.sid) is None:
+            # Сессию завершили во время запроса (invalidate_user_sessions) - не восстанавливаем
+            response.delete_cookie(name, domain=domain, path=path)
+            return
+        if session.sid is None or session.rotate:
+            session.sid = secrets.token_urlsafe(32)
+        ttl = int(app.permanent_session_lifetime.total_seconds())
+        self.store.set(session.sid, dict(session), ttl)
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def create_store(app):
+    backend = app.config.get('SESSION_BACKEND', 'sqlite')
+    if backend == 'memory':
+        return MemorySessionStore()
+    if backend == 'sqlite':
+        path = app.config.get('SESSION_SQLITE_PATH') or os.path.join(app.instance_path, 'sessions.db')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return SqliteSessionStore(path)
+    raise ValueError(f'Неизвестный SESSION_BACKEND: {backend}')
+
+
+def init_app(app):
+    store = create_store(app)
+    app.extensions['session_store'] = store
+    app.session_interface = ServerSessionInterface(store)
+
+
+def invalidate_user_sessions(user_id):
+    # Пользователь будет разлогинен при следующем запросе
+    store = current_app.extensions.get('session_store')
+    if store is not None and user_id is not None:
+        store.delete_for_user(user_id)
+
+
+# --- Текущий пользователь ---
+
+CurrentUser = namedtuple('CurrentUser', 'user_id role client_id email')
+
+
+def login_user(user):
+    # Снимок пользователя кладется в сессию; роль должна быть уже загружена
+    session.clear()
+    session.regenerate()
+    session['user_id'] = user.user_account_id
+    session['role'] = user.role
+    session['client_id'] = user.client_id
+    session['email'] = user.email
+    g.pop('current_user', None)
+
+
+def get_current_user():
+    """Текущий пользователь из сессии (None для гостя); кэшируется на время запроса."""
+    if 'current_user' not in g:
+        user_id = session.get('user_id')
+        g.current_user = CurrentUser(
+            user_id, session.get('role'), session.get('client_id'), session.get('email')
+        ) if user_id else None
+    return g.current_user
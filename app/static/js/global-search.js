@@ -0,0 +1,71 @@
+// Global Search - typeahead over clients, orders, parts and suppliers
+(function() {
+  document.addEventListener('DOMContentLoaded', function() {
+    const input = document.getElementById('global-search');
+    if (!input) return;
+
+    const menu = document.getElementById('global-search-results');
+    const labels = {clients: 'Клиенты', orders: 'Заказы', parts: 'Запчасти', suppliers: 'Поставщики'};
+    let timer = null;
+    let controller = null;
+
+    function hide() {
+      menu.classList.remove('show');
+      menu.innerHTML = '';
+    }
+
+    function render(results) {
+      menu.innerHTML = '';
+      Object.keys(labels).forEach(function(entity) {
+        const items = results[entity] || [];
+        if (!items.length) return;
+        const header = document.createElement('h6');
+        header.className = 'dropdown-header';
+        header.textContent = labels[entity];
+        menu.appendChild(header);
+        items.forEach(function(item) {
+          const link = document.createElement('a');
+          link.className = 'dropdown-item';
+          link.href = item.url;
+          link.textContent = item.title;
+          if (item.subtitle) {
+            const small = document.createElement('small');
+            small.className = 'text-muted ms-2';
+            small.textContent = item.subtitle;
+            link.appendChild(small);
+          }
+          menu.appendChild(link);
+        });
+      });
+      if (!menu.children.length) {
+        const empty = document.createElement('span');
+        empty.className = 'dropdown-item-text text-muted';
+        empty.textContent = 'Ничего не найдено';
+        menu.appendChild(empty);
+      }
+      menu.classList.add('show');
+    }
+
+    // Запрос после паузы в наборе; предыдущий незавершенный запрос отменяется
+    input.addEventListener('input', function() {
+      clearTimeout(timer);
+      const query = input.value.trim();
+      if (query.length < 2) {
+        hide();
+        return;
+      }
+      timer = setTimeout(function() {
+        if (controller) controller.abort();
+        controller = new AbortController();
+        fetch(input.dataset.url + '?q=' + encodeURIComponent(query), {signal: controller.signal})
+          .then(function(response) { return response.json(); })
+          .then(function(data) { render(data.results); })
+          .catch(function() {});
+      }, 150);
+    });
+
+    document.addEventListener('click', function(e) {
+      if (!e.target.closest('#global-search-form')) hide();
+    });
+  });
+})();
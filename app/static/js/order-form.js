@@ -30,16 +30,81 @@
         }
     });
 
-    addPartBtn.addEventListener('click', function() {
-      const template = document.getElementById('part-template');
+    // Автодополнение: варианты клиентов и запчастей запрашиваются с сервера
+    // (admin_bp.lookup_clients / lookup_parts) и подставляются в соседний select
+    const form = addPartBtn.closest('form');
+    const timers = new WeakMap();
+
+    function fillOptions(select, data) {
+        const keep = Array.from(select.options).filter(function(opt) {
+            return opt.value === '' || opt.selected;
+        });
+        const keptValues = keep.map(function(opt) { return opt.value; });
+        select.innerHTML = '';
+        keep.forEach(function(opt) { select.appendChild(opt); });
+        data.items.forEach(function(item) {
+            if (keptValues.indexOf(String(item.id)) !== -1) return;
+            const option = document.createElement('option');
+            option.value = item.id;
+            option.textContent = item.text;
+            if (item.price !== undefined) option.setAttribute('data-price', item.price);
+            select.appendChild(option);
+        });
+        if (data.next) {
+            const more = document.createElement('option');
+            more.disabled = true;
+            more.textContent = '… уточните запрос, чтобы увидеть остальные';
+            select.appendChild(more);
+        }
+    }
+
+    function lookup(input) {
+        const select = input.parentElement.querySelector('.lookup-select');
+        const url = input.dataset.url;
+        const sep = url.indexOf('?') === -1 ? '?' : '&';
+        fetch(url + sep + 'q=' + encodeURIComponent(input.value.trim()))
+            .then(function(response) { return response.json(); })
+            .then(function(data) { fillOptions(select, data); })
+            .catch(function() {});
+    }
+
+    form.addEventListener('input', function(e) {
+        if (!e.target.classList.contains('lookup-search')) return;
+        clearTimeout(timers.get(e.target));
+        timers.set(e.target, setTimeout(function() { lookup(e.target); }, 200));
+    });
+
+    // Первая страница вариантов при первом открытии пустого списка
+    form.addEventListener('focusin', function(e) {
+        if (!e.target.classList.contains('lookup-select') || e.target.dataset.loaded) return;
+        e.target.dataset.loaded = '1';
+        lookup(e.target.parentElement.querySelector('.lookup-search'));
+    });
+
+    function addRow(templateId, target) {
+      const template = document.getElementById(templateId);
       const newPart = template.cloneNode(true);
       newPart.removeAttribute('id');
       newPart.classList.remove('d-none');
       newPart.querySelectorAll('select, input').forEach(el => el.disabled = false);
-      container.appendChild(newPart);
+      delete newPart.querySelector('.lookup-select').dataset.loaded;
+      target.appendChild(newPart);
+    }
+
+    addPartBtn.addEventListener('click', function() {
+      addRow('part-template', container);
     });
 
-    container.addEventListener('click', function(e) {
+    // Выдача по виду и количеству (admin_bp.lookup_catalog)
+    const allocContainer = document.getElementById('alloc-container');
+    const addAllocBtn = document.getElementById('add-alloc-btn');
+    if (addAllocBtn) {
+      addAllocBtn.addEventListener('click', function() {
+        addRow('alloc-template', allocContainer);
+      });
+    }
+
+    form.addEventListener('click', function(e) {
       if (e.target.closest('.remove-part-btn')) {
         e.target.closest('.part-item').remove();
       }
@@ -12,6 +12,8 @@
       newItem.classList.remove('d-none');
       // Enable inputs for the new element
       newItem.querySelectorAll('input').forEach(el => el.disabled = false);
+      // New rows have no part_id: the server inserts them, existing rows are diffed
+      newItem.querySelector('input[name="part_id[]"]').value = '';
       container.appendChild(newItem);
     });
 
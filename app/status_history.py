@@ -0,0 +1,169 @@
+from datetime import datetime, date, timedelta
+import click
+from flask import has_request_context
+from flask.cli import AppGroup
+from sqlalchemy import event, func, select, insert, inspect, case
+from sqlalchemy.orm import Session
+from app import db
+from app.models import WorkOrder, OrderStatusChange
+from app.sessions import get_current_user
+from app import cache
+
+# Журнал смены статусов заказов (order_status_change). Строка добавляется при
+# каждом flush, в котором заказ создан или у него изменился status, - так в
+# журнал попадают все маршруты (manage_order, change_order_status,
+# cancel_order, add_order) без отдельных вызовов. Время пребывания в прежнем
+# статусе и неделя перехода считаются при записи, отчеты - агрегаты по индексам.
+
+DONE_STATUS = 'Выдан'
+CANCELED_STATUS = 'Отменен'
+# Период отчетов по умолчанию
+DEFAULT_DAYS = 365
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _as_datetime(day):
+    return datetime.combine(day, datetime.min.time()) if day else None
+
+
+def _previous_changes(connection, order_ids):
+    # Время последнего перехода каждого заказа - начало пребывания в текущем статусе
+    rows = connection.execute(
+        select(OrderStatusChange.work_order_id, func.max(OrderStatusChange.changed_at))
+        .where(OrderStatusChange.work_order_id.in_(order_ids))
+        .group_by(OrderStatusChange.work_order_id)
+    ).all()
+    return dict(rows)
+
+
+def _row(order_id, from_status, to_status, changed_at, since, user_id=None):
+    return {
+        'work_order_id': order_id,
+        'from_status': from_status,
+        'to_status': to_status,
+        'changed_at': changed_at,
+        'week': week_start(changed_at.date()),
+        'dwell_seconds': max(int((changed_at - since).total_seconds()), 0) if since else None,
+        'user_account_id': user_id,
+    }
+
+
+@event.listens_for(Session, 'after_flush')
+def _log_after_flush(session, flush_context):
+    created, changed = [], []
+    for obj in session.new:
+        if isinstance(obj, WorkOrder) and obj.status:
+            created.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, WorkOrder):
+            history = inspect(obj).attrs.status.history
+            if history.has_changes() and history.deleted and history.deleted[0] != obj.status:
+                changed.append((obj, history.deleted[0]))
+    if not (created or changed):
+        return
+
+    now = datetime.utcnow()
+    user = get_current_user() if has_request_context() else None
+    user_id = user.user_id if user else None
+    connection = session.connection()
+    rows = [_row(order.work_order_id, None, order.status, now, None, user_id) for order in created]
+    if changed:
+        previous = _previous_changes(connection, [order.work_order_id for order, _ in changed])
+        for order, old_status in changed:
+            since = previous.get(order.work_order_id) or _as_datetime(order.received_date)
+            rows.append(_row(order.work_order_id, old_status, order.status, now, since, user_id))
+    connection.execute(insert(OrderStatusChange), rows)
+    cache.mark_written(session, OrderStatusChange.__tablename__)
+
+
+def default_period():
+    end = date.today() + timedelta(days=1)
+    return end - timedelta(days=DEFAULT_DAYS), end
+
+
+def dwell_by_status(start, end):
+    """Время пребывания в статусах для переходов из них за [start, end)."""
+    rows = db.session.execute(
+        select(
+            OrderStatusChange.from_status,
+            func.count(),
+            func.avg(OrderStatusChange.dwell_seconds),
+            func.max(OrderStatusChange.dwell_seconds),
+        )
+        .where(
+            OrderStatusChange.changed_at >= _as_datetime(start),
+            OrderStatusChange.changed_at < _as_datetime(end),
+            OrderStatusChange.from_status.isnot(None),
+            OrderStatusChange.dwell_seconds.isnot(None),
+        )
+        .group_by(OrderStatusChange.from_status)
+    ).all()
+    day = 86400
+    return sorted((
+        {
+            'status': status,
+            'transitions': count,
+            'avg_days': round(float(avg or 0) / day, 2),
+            'max_days': round((longest or 0) / day, 2),
+        }
+        for status, count, avg, longest in rows
+    ), key=lambda row: row['status'])
+
+
+def weekly_throughput(start, end):
+    """Принятые, выданные и отмененные заказы по неделям за [start, end)."""
+    received = func.sum(case((OrderStatusChange.from_status.is_(None), 1), else_=0))
+    done = func.sum(case((OrderStatusChange.to_status == DONE_STATUS, 1), else_=0))
+    canceled = func.sum(case((OrderStatusChange.to_status == CANCELED_STATUS, 1), else_=0))
+    rows = db.session.execute(
+        select(OrderStatusChange.week, received, done, canceled)
+        .where(OrderStatusChange.week >= week_start(start), OrderStatusChange.week < end)
+        .group_by(OrderStatusChange.week)
+        .order_by(OrderStatusChange.week)
+    ).all()
+    return [
+        {'week': week, 'received': received or 0, 'done': done or 0, 'canceled': canceled or 0}
+        for week, received, done, canceled in rows
+    ]
+
+
+def backfill(batch_size=1000):
+    """Приблизительная история для заказов без записей в журнале.
+
+    Известны только дата приема и дата завершения, поэтому заказ получает
+    переход в 'Принят' на дату приема и, если статус другой, переход в текущий
+    статус на дату завершения (или приема). Коммит за вызывающим.
+    """
+    logged = select(OrderStatusChange.work_order_id).distinct()
+    query = db.session.query(
+        WorkOrder.work_order_id, WorkOrder.status, WorkOrder.received_date, WorkOrder.completion_date
+    ).filter(WorkOrder.work_order_id.not_in(logged)).order_by(WorkOrder.work_order_id)
+
+    rows, total = [], 0
+    for order_id, status, received, completed in query.yield_per(batch_size):
+        received_at = _as_datetime(received)
+        rows.append(_row(order_id, None, 'Принят', received_at, None))
+        if status and status != 'Принят':
+            changed_at = max(_as_datetime(completed or received), received_at)
+            rows.append(_row(order_id, 'Принят', status, changed_at, received_at))
+        total += 1
+        if len(rows) >= batch_size:
+            db.session.execute(insert(OrderStatusChange), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(OrderStatusChange), rows)
+    return total
+
+
+history_cli = AppGroup('history', help='История статусов заказов.')
+
+
+@history_cli.command('backfill')
+def backfill_command():
+    """Заполнить журнал для заказов, созданных до его появления."""
+    total = backfill()
+    db.session.commit()
+    click.echo(f'Заказов дополнено историей: {total}')
@@ -0,0 +1,100 @@
+"""Пропускная способность входа (/login) для разных параметров хэширования.
+
+    python benchmarks/login_benchmark.py --seconds 5 --threads 4
+    python benchmarks/login_benchmark.py --method scrypt:16384:8:1 --method pbkdf2:sha256:600000
+
+Для каждого метода создает пользователей с хэшами этого метода и отправляет
+POST /login из нескольких потоков. Печатает входы в секунду, в пересчете на
+ядро (потоков, но не больше числа ядер) и чистую стоимость одной проверки хэша.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash, check_password_hash
+from config import Config
+from app import create_app, db
+from app.models import User, Role
+
+DEFAULT_METHODS = ('scrypt', 'scrypt:16384:8:1', 'pbkdf2:sha256:1000000', 'pbkdf2:sha256:600000')
+PASSWORD = 'benchmark-password'
+
+
+def hash_cost(method, repeat=5):
+    password_hash = generate_password_hash(PASSWORD, method=method)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        check_password_hash(password_hash, PASSWORD)
+    return (time.perf_counter() - started) / repeat
+
+
+def run(method, args):
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'login_bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SESSION_BACKEND = 'memory'
+        PASSWORD_HASH_METHOD = method
+        PASSWORD_VERIFY_THREADS = args.threads
+
+    app = create_app(BenchConfig)
+    prefix = f'bench-{os.getpid()}-{method.replace(":", "-")}'
+    with app.app_context():
+        role_id = Role.query.filter_by(role_name='client').first().role_id
+        password_hash = generate_password_hash(PASSWORD, method=method)
+        db.session.add_all(
+            User(email=f'{prefix}-{i}@example.com', password=password_hash, role_id=role_id)
+            for i in range(args.threads)
+        )
+        db.session.commit()
+
+    counts = [0] * args.threads
+    errors = [0] * args.threads
+    deadline = time.perf_counter() + args.seconds
+
+    def worker(index):
+        client = app.test_client()
+        email = f'{prefix}-{index}@example.com'
+        while time.perf_counter() < deadline:
+            response = client.post('/login', data={'email': email, 'password': PASSWORD})
+            client.get('/logout')
+            if response.status_code == 302:
+                counts[index] += 1
+            else:
+                errors[index] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    rate = sum(counts) / elapsed
+    cores = min(args.threads, os.cpu_count() or 1)
+    return rate, rate / cores, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='URL базы (по умолчанию временная SQLite)')
+    parser.add_argument('--method', action='append', help='метод хэширования (можно несколько раз)')
+    parser.add_argument('--threads', type=int, default=1, help='потоков-клиентов')
+    parser.add_argument('--seconds', type=float, default=5, help='длительность замера на метод')
+    args = parser.parse_args()
+
+    print(f'{"метод":<28} {"хэш, мс":>8} {"входов/с":>9} {"на ядро":>8} {"ошибок":>7}')
+    for method in args.method or DEFAULT_METHODS:
+        cost = hash_cost(method)
+        rate, per_core, errors = run(method, args)
+        print(f'{method:<28} {cost * 1000:>8.1f} {rate:>9.1f} {per_core:>8.1f} {errors:>7}')
+
+
+if __name__ == '__main__':
+    main()
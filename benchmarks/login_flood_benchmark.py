@@ -0,0 +1,111 @@
+"""Задержка входа обычного пользователя во время перебора паролей.
+
+    python benchmarks/login_flood_benchmark.py --seconds 10 --attackers 8
+
+Потоки-атакующие шлют POST /login с неверными паролями к существующим
+учетным записям с нескольких IP, а обычный пользователь входит и выходит со своего IP.
+Замер выполняется без ограничения попыток и с ним (RATELIMIT_ENABLED),
+печатаются p50/p95 задержки входа пользователя и доля отклоненных (429)
+запросов атакующих.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app import create_app, db
+from app.models import User, Role
+from app.profiler import percentile
+
+PASSWORD = 'legit-password'
+USER_EMAIL = 'flood-bench-user@example.com'
+USER_IP = '192.168.1.10'
+
+
+def run(enabled, args):
+    workdir = tempfile.mkdtemp()
+    database_url = args.database_url or 'sqlite:///' + os.path.join(workdir, 'flood_bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SESSION_BACKEND = 'memory'
+        RATELIMIT_ENABLED = enabled
+        RATELIMIT_BACKEND = args.backend
+        RATELIMIT_SQLITE_PATH = os.path.join(workdir, 'ratelimit.db')
+
+    app = create_app(BenchConfig)
+    victims = [f'flood-bench-victim-{i}@example.com' for i in range(args.victims)]
+    with app.app_context():
+        role_id = Role.query.filter_by(role_name='client').first().role_id
+        for email in [USER_EMAIL] + victims:
+            if not User.query.filter_by(email=email).first():
+                user = User(email=email, role_id=role_id)
+                user.set_password(PASSWORD)
+                db.session.add(user)
+        db.session.commit()
+
+    deadline = time.perf_counter() + args.seconds
+    attacks = {'total': 0, 'limited': 0}
+    lock = threading.Lock()
+    latencies = []
+
+    def attacker(index):
+        client = app.test_client()
+        environ = {'REMOTE_ADDR': f'10.0.0.{index % args.attacker_ips + 1}'}
+        attempt = 0
+        while time.perf_counter() < deadline:
+            attempt += 1
+            response = client.post('/login', environ_base=environ, data={
+                'email': victims[(index + attempt) % len(victims)], 'password': 'wrong',
+            })
+            with lock:
+                attacks['total'] += 1
+                attacks['limited'] += response.status_code == 429
+
+    def legit():
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.post('/login', environ_base={'REMOTE_ADDR': USER_IP},
+                        data={'email': USER_EMAIL, 'password': PASSWORD})
+            latencies.append(time.perf_counter() - started)
+            client.get('/logout', environ_base={'REMOTE_ADDR': USER_IP})
+            time.sleep(args.user_interval)
+
+    threads = [threading.Thread(target=attacker, args=(i,)) for i in range(args.attackers)]
+    threads.append(threading.Thread(target=legit))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, attacks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='URL базы (по умолчанию временная SQLite)')
+    parser.add_argument('--backend', default='sqlite', choices=('sqlite', 'memory'), help='хранилище счетчиков')
+    parser.add_argument('--attackers', type=int, default=8, help='потоков-атакующих')
+    parser.add_argument('--victims', type=int, default=50, help='атакуемых учетных записей')
+    parser.add_argument('--attacker-ips', type=int, default=2, help='число IP атакующих')
+    parser.add_argument('--seconds', type=float, default=15, help='длительность каждого замера')
+    parser.add_argument('--user-interval', type=float, default=0.5, help='пауза между входами пользователя, с')
+    args = parser.parse_args()
+
+    print(f'{"ограничение":<12} {"входов":>7} {"p50, мс":>8} {"p95, мс":>8} {"атак":>7} {"отклонено":>10}')
+    for enabled in (False, True):
+        latencies, attacks = run(enabled, args)
+        limited = attacks['limited'] / attacks['total'] * 100 if attacks['total'] else 0
+        print(f'{"вкл" if enabled else "выкл":<12} {len(latencies):>7} '
+              f'{statistics.median(latencies) * 1000 if latencies else 0:>8.1f} '
+              f'{percentile(latencies, 0.95) * 1000:>8.1f} {attacks["total"]:>7} {limited:>9.1f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Объем записи при редактировании поставки (manage_supply).
+
+    python benchmarks/supply_edit_benchmark.py --lines 500
+
+Создает поставку из N строк через форму и редактирует ее разными способами,
+считая SQL-запросы и число записанных строк (rowcount INSERT/UPDATE/DELETE).
+Для сравнения: прежняя схема удаляла и вставляла заново все N строк.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from config import Config
+from app import create_app, db
+from app.models import Part, Supply, Supplier
+
+WRITE_RE = re.compile(r'^\s*(INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+
+class WriteCounter:
+    def __init__(self):
+        self.statements = 0
+        self.rows_written = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+        if WRITE_RE.match(statement) and cursor.rowcount and cursor.rowcount > 0:
+            self.rows_written += cursor.rowcount
+
+
+def form_data(supplier_id, parts):
+    return {
+        'supplier_id': str(supplier_id),
+        'supply_date': date.today().isoformat(),
+        'part_id[]': [str(part_id or '') for part_id, _, _ in parts],
+        'part_name[]': [name for _, name, _ in parts],
+        'part_price[]': [str(price) for _, _, price in parts],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='URL базы (по умолчанию временная SQLite)')
+    parser.add_argument('--lines', type=int, default=500, help='строк в поставке')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'supply_bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+
+    app = create_app(BenchConfig)
+    client = app.test_client()
+    client.post('/login', data={
+        'email': os.environ.get('ADMIN_EMAIL') or 'admin@example.com',
+        'password': os.environ.get('ADMIN_PASSWORD') or 'admin123',
+    })
+
+    with app.app_context():
+        supplier = Supplier(name=f'Поставщик для замера {os.getpid()}')
+        db.session.add(supplier)
+        db.session.commit()
+        supplier_id = supplier.supplier_id
+        engine = db.engine
+
+    client.post('/admin/supply/manage', data=form_data(
+        supplier_id, [(None, f'Запчасть {i}', 10 + i % 50) for i in range(args.lines)]
+    ))
+    with app.app_context():
+        supply_id = db.session.query(Supply.supply_id).filter_by(supplier_id=supplier_id).scalar()
+
+    def current_parts():
+        with app.app_context():
+            return [(p.part_id, p.name, p.price) for p in Part.query.filter_by(supply_id=supply_id).order_by(Part.part_id)]
+
+    parts = current_parts()
+    scenarios = [
+        ('без изменений', parts),
+        ('изменена одна цена', [(parts[0][0], parts[0][1], parts[0][2] + 1)] + parts[1:]),
+        ('+5 строк, -5 строк', parts[5:] + [(None, f'Новая {i}', 5) for i in range(5)]),
+    ]
+
+    print(f'Поставка из {args.lines} строк; прежняя схема писала {2 * args.lines} строк при любом изменении')
+    print(f'{"сценарий":25} {"запросов":>10} {"строк записано":>16}')
+    for title, rows in scenarios:
+        counter = WriteCounter()
+        event.listen(engine, 'after_cursor_execute', counter)
+        response = client.post(f'/admin/supply/manage/{supply_id}', data=form_data(supplier_id, rows))
+        event.remove(engine, 'after_cursor_execute', counter)
+        assert response.status_code == 302, response.status_code
+        print(f'{title:25} {counter.statements:10} {counter.rows_written:16}')
+        parts = current_parts()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import os
+import sys
+from contextlib import contextmanager
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app import create_app, db
+from app import query_counter
+
+ADMIN_EMAIL = 'admin@example.com'
+ADMIN_PASSWORD = 'admin123'
+
+
+class TestConfig(Config):
+    TESTING = True
+    SESSION_BACKEND = 'memory'
+    RATELIMIT_ENABLED = False
+    RATELIMIT_BACKEND = 'memory'
+    SQLALCHEMY_REPLICA_URI = None
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Приложение на SQLite-файле во временном каталоге; параметры - поверх TestConfig."""
+    def factory(**config):
+        settings = {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'primary.db'),
+            'NOTIFY_FILE_PATH': str(tmp_path / 'notifications.log'),
+        }
+        settings.update(config)
+        return create_app(type('AppTestConfig', (TestConfig,), settings))
+    return factory
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+def login(client, email=ADMIN_EMAIL, password=ADMIN_PASSWORD):
+    client.post('/login', data={'email': email, 'password': password})
+    # Приветствие из flash выводится первой страницей
+    client.get('/profile')
+    return client
+
+
+@pytest.fixture
+def login_as(app):
+    """login_as(email, password) - тестовый клиент, вошедший под пользователем."""
+    return lambda email, password: login(app.test_client(), email, password)
+
+
+@pytest.fixture
+def admin_client(app):
+    return login(app.test_client())
+
+
+@pytest.fixture
+def populate(app):
+    """populate(n) добавляет n заказов со связанными данными (benchmarks/datagen.py)."""
+    from benchmarks import datagen
+
+    def add(orders, seed=42):
+        with app.app_context():
+            datagen.populate(orders, seed=seed)
+            datagen.build_indexes()
+    return add
+
+
+@pytest.fixture
+def count_queries(app):
+    """Счетчик SQL основной базы (app/query_counter.py):
+
+        with count_queries() as counter:
+            admin_client.get('/admin/orders')
+    """
+    @contextmanager
+    def counting(bind=None):
+        with app.app_context():
+            engine = db.engines[bind]
+        with query_counter.count_queries(engine) as counter:
+            yield counter
+    return counting
@@ -0,0 +1,43 @@
+import pytest
+
+# Число запросов страниц админ-панели (user-002) не зависит от числа строк:
+# связи, нужные шаблонам, загружаются жадно. Счет сравнивается на N и 10×N
+# заказов (клиенты, запчасти, поставки и пользователи растут вместе с ними).
+# Страница списка вмещает все строки, чтобы N+1 проявился в разнице счета.
+# Первый запрос каждой страницы - версии таблиц для ETag (app/http_cache.py),
+# у поставщиков и поставок связанные строки догружаются отдельным запросом (selectinload).
+# Кэш фрагментов выключен, чтобы считались запросы самого рендеринга.
+
+QUERY_LIMITS = {
+    '/admin/': 6,
+    '/admin/orders': 2,
+    '/admin/clients': 2,
+    '/admin/parts': 2,
+    '/admin/suppliers': 3,
+    '/admin/supplies': 3,
+    '/admin/users': 2,
+}
+N = 100
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(CACHE_ENABLED=False, ITEMS_PER_PAGE=100000)
+
+
+def page_queries(admin_client, count_queries, url):
+    admin_client.get(url)  # прогрев: ленивые счетчики админ-панели
+    with count_queries() as counter:
+        response = admin_client.get(url)
+    assert response.status_code == 200
+    return counter
+
+
+@pytest.mark.parametrize('url,limit', QUERY_LIMITS.items())
+def test_admin_page_queries_constant(admin_client, populate, count_queries, url, limit):
+    populate(N)
+    small = page_queries(admin_client, count_queries, url)
+    populate(9 * N, seed=7)
+    large = page_queries(admin_client, count_queries, url)
+    assert large.count == small.count, large.statements
+    assert large.count <= limit, large.statements
@@ -0,0 +1,55 @@
+from sqlalchemy import select, update
+from app import db
+from app import catalog
+from app.models import Client, Part, WorkOrder
+
+# Счетчики каталога (user-021) сходятся с таблицей part после изменений.
+
+
+def test_delete_order_returns_parts_to_stock(app, admin_client, populate):
+    populate(50)
+    with app.app_context():
+        order_id = db.session.scalars(select(Part.work_order_id).where(Part.work_order_id.isnot(None))).first()
+    response = admin_client.post(f'/admin/order/{order_id}/delete')
+    assert response.status_code == 302
+    with app.app_context():
+        assert db.session.get(WorkOrder, order_id) is None
+        assert catalog.reconcile() == []
+
+
+def test_delete_client_returns_parts_to_stock(app, admin_client, populate):
+    populate(50)
+    with app.app_context():
+        client_id = db.session.scalars(
+            select(WorkOrder.client_id).join(Part, Part.work_order_id == WorkOrder.work_order_id)
+        ).first()
+        # Удалить можно только клиента без активных заказов
+        db.session.execute(update(WorkOrder).where(WorkOrder.client_id == client_id).values(status='Отменен'))
+        db.session.commit()
+    response = admin_client.post(f'/admin/client/{client_id}/delete')
+    assert response.status_code == 302
+    with app.app_context():
+        assert db.session.get(Client, client_id) is None
+        assert catalog.reconcile() == []
+
+
+def test_import_updates_catalog_in_batches(app, count_queries):
+    from app import importer
+    from app.models import Supplier
+
+    with app.app_context():
+        db.session.add(Supplier(name='Поставщик импорта'))
+        db.session.commit()
+        catalog.reconcile()
+        db.session.commit()
+        # Новые и уже известные виды вперемешку, несколько пачек импорта
+        rows = [['supplier', 'supply_date', 'part_name', 'price']] + [
+            ['Поставщик импорта', '2024-01-01', f'Деталь {i % 1500}', '10.00']
+            for i in range(3 * importer.BATCH_SIZE)
+        ]
+        with count_queries() as counter:
+            result = importer.import_supplies(iter(rows))
+        assert result.parts_created == len(rows) - 1
+        catalog_writes = [s for s in counter.statements if 'catalog_item' in s and not s.startswith('SELECT')]
+        assert len(catalog_writes) <= 3
+        assert catalog.reconcile() == []
@@ -0,0 +1,36 @@
+from app import db
+from app import dashboard
+from app.models import DashboardCounter, PartUsageCounter
+
+# Счетчики админ-панели (user-004): заполняются при запуске, /admin/ только читает,
+# дельты по названиям запчастей применяются upsert'ом.
+
+
+def test_counters_filled_at_startup(app):
+    with app.app_context():
+        assert db.session.get(DashboardCounter, 'total_clients') is not None
+
+
+def test_admin_index_does_not_rebuild(app, admin_client, populate):
+    populate(20)
+    with app.app_context():
+        expected = dashboard.get_stats()
+        DashboardCounter.query.delete()
+        PartUsageCounter.query.delete()
+        db.session.commit()
+    response = admin_client.get('/admin/')
+    assert response.status_code == 200
+    with app.app_context():
+        assert DashboardCounter.query.count() == 0
+        stats = dashboard.get_stats()
+    assert stats['total_clients'] == expected['total_clients']
+    assert stats['revenue'] == expected['revenue']
+    assert [tuple(row) for row in stats['popular_parts']] == [tuple(row) for row in expected['popular_parts']]
+
+
+def test_usage_delta_creates_and_updates_rows(app):
+    with app.app_context():
+        dashboard.apply_delta({}, {'Новая запчасть': 2})
+        dashboard.apply_delta({}, {'Новая запчасть': 3})
+        db.session.commit()
+        assert db.session.get(PartUsageCounter, 'Новая запчасть').units == 5
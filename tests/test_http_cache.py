@@ -0,0 +1,37 @@
+from sqlalchemy import select
+from app import db
+from app.models import WorkOrder
+
+# ETag страниц (user-025): повторный запрос с тем же If-None-Match получает 304,
+# пока не изменились данные страницы.
+
+ANALYTICS_PAGES = ['/admin/analytics/turnaround', '/admin/reports']
+
+
+def revalidate(client, url, etag):
+    return client.get(url, headers={'If-None-Match': etag})
+
+
+def test_unchanged_page_answers_304(admin_client, populate):
+    populate(20)
+    etag = admin_client.get('/admin/orders').headers['ETag']
+    response = revalidate(admin_client, '/admin/orders', etag)
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_status_change_refreshes_analytics_pages(app, admin_client, populate):
+    populate(20)
+    with app.app_context():
+        order = db.session.scalars(select(WorkOrder)).first()
+        order.status = 'Принят'
+        db.session.commit()
+        order_id = order.work_order_id
+    etags = {url: admin_client.get(url).headers['ETag'] for url in ANALYTICS_PAGES}
+    assert all(revalidate(admin_client, url, etag).status_code == 304 for url, etag in etags.items())
+
+    assert admin_client.post(f'/admin/order/{order_id}/change_status').status_code == 302
+    admin_client.get('/profile')  # flash о смене статуса
+
+    for url, etag in etags.items():
+        assert revalidate(admin_client, url, etag).status_code == 200, url
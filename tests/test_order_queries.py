@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import update
+from app import db
+from app.models import User, WorkOrder
+
+# Число запросов страниц заказов не зависит от числа заказов (user-001):
+# суммы запчастей загружаются вместе со списком, а не запросом на строку.
+
+ORDER_PAGES = ['/admin/orders', '/admin/']
+N = 20
+
+
+def page_queries(admin_client, count_queries, url):
+    admin_client.get(url)  # прогрев: ленивые счетчики админ-панели
+    with count_queries() as counter:
+        response = admin_client.get(url)
+    assert response.status_code == 200
+    return counter.count
+
+
+@pytest.mark.parametrize('url', ORDER_PAGES)
+def test_order_page_queries_constant(admin_client, populate, count_queries, url):
+    populate(N)
+    small = page_queries(admin_client, count_queries, url)
+    populate(9 * N, seed=7)
+    large = page_queries(admin_client, count_queries, url)
+    assert large == small
+
+
+@pytest.mark.parametrize('url', ['/', '/profile'])
+def test_client_order_history_queries_constant(app, populate, count_queries, login_as, url):
+    populate(N)
+    with app.app_context():
+        user = User.query.filter(User.client_id.isnot(None)).first()
+        email, client_id = user.email, user.client_id
+    client = login_as(email, 'bench-password')
+    with count_queries() as counter:
+        assert client.get(url).status_code == 200
+    small = counter.count
+    populate(9 * N, seed=7)
+    with app.app_context():
+        # Новые заказы достаются другим клиентам; часть передаем этому, чтобы его список вырос
+        db.session.execute(update(WorkOrder).where(WorkOrder.work_order_id % 10 == 0)
+                           .values(client_id=client_id))
+        db.session.commit()
+    with count_queries() as counter:
+        assert client.get(url).status_code == 200
+    assert counter.count == small
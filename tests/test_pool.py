@@ -0,0 +1,56 @@
+import importlib
+import config
+from app import pool
+
+# Ограничение времени запросов Postgres (user-015): только для веб-запросов,
+# DB_STATEMENT_TIMEOUT=0 отключает его.
+
+PG_URL = 'postgresql+psycopg2://user@localhost/shop'
+
+
+class FakeConnection:
+    class dialect:
+        name = 'postgresql'
+
+    def __init__(self):
+        self.statements = []
+
+    def exec_driver_sql(self, statement):
+        self.statements.append(statement)
+
+
+def load_config(monkeypatch, value):
+    if value is None:
+        monkeypatch.delenv('DB_STATEMENT_TIMEOUT', raising=False)
+    else:
+        monkeypatch.setenv('DB_STATEMENT_TIMEOUT', value)
+    return importlib.reload(config).Config
+
+
+def test_statement_timeout_config(monkeypatch):
+    try:
+        assert load_config(monkeypatch, None).DB_STATEMENT_TIMEOUT == 30000
+        assert load_config(monkeypatch, '5000').DB_STATEMENT_TIMEOUT == 5000
+        assert load_config(monkeypatch, '0').DB_STATEMENT_TIMEOUT == 0
+    finally:
+        monkeypatch.undo()
+        importlib.reload(config)
+
+
+def test_zero_timeout_sets_no_connect_option():
+    options = pool.engine_options({'SQLALCHEMY_DATABASE_URI': PG_URL, 'DB_STATEMENT_TIMEOUT': 0})
+    assert 'connect_args' not in options
+    options = pool.engine_options({'SQLALCHEMY_DATABASE_URI': PG_URL, 'DB_STATEMENT_TIMEOUT': 30000})
+    assert options['connect_args']['options'] == '-c statement_timeout=30000'
+
+
+def test_timeout_lifted_outside_requests(app):
+    app.config['DB_STATEMENT_TIMEOUT'] = 30000
+    with app.app_context():
+        connection = FakeConnection()
+        pool._lift_statement_timeout(None, None, connection)
+        assert connection.statements == ['SET LOCAL statement_timeout = 0']
+    with app.test_request_context('/'):
+        connection = FakeConnection()
+        pool._lift_statement_timeout(None, None, connection)
+        assert connection.statements == []
@@ -0,0 +1,18 @@
+from app import passwords
+from app.passwords import PasswordCheckBusy
+
+# Смена пароля в профиле (user-013) при переполненной очереди проверок паролей.
+
+
+def test_change_password_when_pool_busy(admin_client, monkeypatch):
+    def busy(password_hash, password):
+        raise PasswordCheckBusy()
+
+    monkeypatch.setattr(passwords, 'verify', busy)
+    response = admin_client.post('/profile', data={
+        'change_password': '1', 'old_password': 'admin123', 'new_password': 'new-secret',
+    })
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/profile')
+    with admin_client.session_transaction() as session:
+        assert [category for category, _ in session['_flashes']] == ['warning']
@@ -0,0 +1,38 @@
+import shutil
+import pytest
+from flask import g
+from sqlalchemy import text
+from app import db
+from app import profiler
+
+# Профилировщик (user-016): упавший запрос не сбивает замеры следующих,
+# запросы к реплике тоже учитываются.
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    make_app()
+    shutil.copy(tmp_path / 'primary.db', tmp_path / 'replica.db')
+    return make_app(PROFILING_ENABLED=True,
+                    SQLALCHEMY_REPLICA_URI='sqlite:///' + str(tmp_path / 'replica.db'))
+
+
+def test_failed_statement_is_not_counted(app):
+    perf = profiler.get_profiler(app)
+    with app.test_request_context('/'):
+        perf._start_request()
+        with pytest.raises(Exception):
+            db.session.execute(text('SELECT * FROM no_such_table'))
+        db.session.rollback()
+        connection = db.session.connection()
+        connection.execute(text('SELECT 1'))
+        assert g.profile['queries'] == 1
+        # Метки времени не копятся на соединении
+        assert not any(key.startswith('profiler') for key in connection.info)
+
+
+def test_replica_queries_are_profiled(app, admin_client):
+    admin_client.get('/admin/orders')
+    perf = profiler.get_profiler(app)
+    row = next(row for row in perf.summary() if row['endpoint'] == 'admin_bp.admin_orders')
+    assert row['queries_max'] >= 2
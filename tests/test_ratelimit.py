@@ -0,0 +1,33 @@
+import pytest
+
+# Ограничение попыток входа за обратным прокси (user-014): корзины по адресу
+# клиента из X-Forwarded-For, а не по адресу прокси.
+
+PROXY_ADDR = '10.0.0.1'
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(RATELIMIT_ENABLED=True, RATELIMIT_BACKEND='memory', PROXY_FIX_X_FOR=1,
+                    LOGIN_RATE_LIMIT_IP='2/60')
+
+
+def attempt(client, forwarded_for, n):
+    return client.post('/login', data={'email': f'nobody{n}@example.com', 'password': 'wrong'},
+                       headers={'X-Forwarded-For': forwarded_for},
+                       environ_base={'REMOTE_ADDR': PROXY_ADDR})
+
+
+def test_clients_behind_proxy_have_separate_buckets(app):
+    client = app.test_client()
+    statuses = [attempt(client, '203.0.113.5', n).status_code for n in range(3)]
+    assert statuses[-1] == 429
+    assert attempt(client, '198.51.100.7', 3).status_code == 200
+
+
+def test_forwarded_header_ignored_without_proxy(make_app):
+    app = make_app(RATELIMIT_ENABLED=True, RATELIMIT_BACKEND='memory', LOGIN_RATE_LIMIT_IP='2/60')
+    client = app.test_client()
+    # Без PROXY_FIX_X_FOR подставной заголовок не дает новую корзину
+    statuses = [attempt(client, f'203.0.113.{n}', n).status_code for n in range(3)]
+    assert statuses[-1] == 429
@@ -0,0 +1,56 @@
+import shutil
+import sqlite3
+import pytest
+
+# Чтение с реплики (user-024): две SQLite-базы, реплика намеренно отстает
+# от основной. Списки и отчеты читаются с реплики, после записи сессия
+# читает из основной базы.
+
+REPLICA_ONLY = 'Репликов'
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    make_app()  # схема и начальные данные в основной базе
+    shutil.copy(tmp_path / 'primary.db', tmp_path / 'replica.db')
+    with sqlite3.connect(tmp_path / 'replica.db') as replica:
+        replica.execute("INSERT INTO client (last_name, first_name) VALUES (?, 'Только')", (REPLICA_ONLY,))
+    return make_app(SQLALCHEMY_REPLICA_URI='sqlite:///' + str(tmp_path / 'replica.db'),
+                    DB_REPLICA_PIN_SECONDS=60)
+
+
+@pytest.mark.parametrize('url', ['/admin/clients', '/admin/orders', '/admin/reports',
+                                 '/admin/analytics/turnaround'])
+def test_list_and_report_reads_go_to_replica(admin_client, count_queries, url):
+    with count_queries() as primary, count_queries('replica') as replica:
+        response = admin_client.get(url)
+    assert response.status_code == 200
+    assert primary.count == 0, primary.statements
+    assert replica.count > 0
+
+
+def test_replica_data_is_shown(admin_client):
+    assert REPLICA_ONLY in admin_client.get('/admin/clients').get_data(as_text=True)
+
+
+def test_reads_after_write_are_pinned_to_primary(admin_client, login_as, count_queries):
+    response = admin_client.post('/admin/client/manage',
+                                 data={'last_name': 'Основной', 'first_name': 'Новый', 'phone': ''})
+    assert response.status_code == 302
+
+    with count_queries() as primary, count_queries('replica') as replica:
+        page = admin_client.get('/admin/clients').get_data(as_text=True)
+    assert 'Основной' in page and REPLICA_ONLY not in page
+    assert replica.count == 0
+    assert primary.count > 0
+
+    # Другая сессия не прикреплена и читает отстающую реплику
+    other = login_as('admin@example.com', 'admin123')
+    page = other.get('/admin/clients').get_data(as_text=True)
+    assert REPLICA_ONLY in page and 'Основной' not in page
+
+
+def test_post_requests_use_primary(admin_client, count_queries):
+    with count_queries('replica') as replica:
+        admin_client.post('/admin/reports')
+    assert replica.count == 0
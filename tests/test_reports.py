@@ -0,0 +1,86 @@
+from decimal import Decimal
+from sqlalchemy import select
+from app import db
+from app import reports, allocation
+from app.models import Part, Supply, WorkOrder, ReportRevenue, ReportPartUsage
+
+# Сводки отчетов (user-020): пересчет только отмеченных дней дает то же, что
+# полный пересчет, в том числе после пакетных изменений запчастей.
+
+
+def snapshot():
+    revenue = db.session.execute(select(
+        ReportRevenue.period, ReportRevenue.period_start, ReportRevenue.orders_received,
+        ReportRevenue.orders_done, ReportRevenue.work_revenue, ReportRevenue.parts_revenue,
+    ).order_by(ReportRevenue.period, ReportRevenue.period_start)).all()
+    usage = db.session.execute(select(
+        ReportPartUsage.period, ReportPartUsage.period_start, ReportPartUsage.name,
+        ReportPartUsage.units, ReportPartUsage.revenue,
+    ).order_by(ReportPartUsage.period, ReportPartUsage.period_start, ReportPartUsage.name)).all()
+    return revenue, usage
+
+
+def assert_incremental_matches_full():
+    reports.refresh()
+    db.session.commit()
+    incremental = snapshot()
+    reports.refresh(full=True)
+    db.session.commit()
+    assert snapshot() == incremental
+
+
+def test_supply_edit_marks_report_days(app, admin_client, populate):
+    populate(100)
+    with app.app_context():
+        supply = db.session.scalars(
+            select(Supply).join(Part).join(WorkOrder).where(WorkOrder.status == reports.DONE_STATUS)
+        ).first()
+        parts = db.session.scalars(select(Part).where(Part.supply_id == supply.supply_id)).all()
+        attached = [part for part in parts if part.work_order_id]
+        # Первая установленная запчасть дорожает, вторая (если есть) удаляется
+        kept = [part for part in parts if part not in attached[1:2]]
+        form = {
+            'supplier_id': supply.supplier_id,
+            'supply_date': supply.supply_date.isoformat(),
+            'part_id[]': [part.part_id for part in kept],
+            'part_name[]': [part.name for part in kept],
+            'part_price[]': [str(part.price + (Decimal('100') if part is attached[0] else 0)) for part in kept],
+        }
+        supply_id = supply.supply_id
+
+    response = admin_client.post(f'/admin/supply/manage/{supply_id}', data=form)
+    assert response.status_code == 302
+    with app.app_context():
+        assert reports.pending_days()
+        assert_incremental_matches_full()
+
+
+def test_order_part_changes_mark_report_days(app, admin_client, populate):
+    populate(100)
+    with app.app_context():
+        order = db.session.scalars(
+            select(WorkOrder).join(Part).where(WorkOrder.status == reports.DONE_STATUS)
+        ).first()
+        part_ids = [part.part_id for part in order.parts]
+        free = db.session.scalars(select(Part).where(Part.work_order_id.is_(None))).first()
+        form = {
+            'client_id': order.client_id,
+            'phone_model': order.phone_model,
+            'problem_description': order.problem_description or '',
+            'received_date': order.received_date.isoformat(),
+            'completion_date': order.completion_date.isoformat() if order.completion_date else '',
+            'status': order.status,
+            'work_cost': str(order.work_cost),
+            # Одна запчасть снимается, одна свободная ставится
+            'part_id[]': part_ids[1:] + [free.part_id],
+            'part_price[]': ['1.00'] * len(part_ids[1:] + [free.part_id]),
+        }
+        order_id = order.work_order_id
+        free_name = free.name
+
+    admin_client.post(f'/admin/order/manage/{order_id}', data=form)
+    with app.app_context():
+        assert_incremental_matches_full()
+        allocation.allocate(order_id, free_name, 1)
+        db.session.commit()
+        assert_incremental_matches_full()
@@ -0,0 +1,32 @@
+import pytest
+from app import db
+from app import search
+from app.models import Client
+
+# Общий поиск по префиксам слов (user-006): продолжение слова может содержать
+# символы вне BMP и другой алфавит.
+
+
+@pytest.mark.parametrize('last_name,query', [
+    ('Тест𝔘ник', 'тест'),
+    ('Смит𐐨ов', 'смит'),
+    ('Iphoneпро', 'iphone'),
+    ('Прошкаz', 'прошка'),
+])
+def test_prefix_match_with_unusual_completion(app, last_name, query):
+    with app.test_request_context():
+        client = Client(last_name=last_name, first_name='Иван', phone='+375291112233')
+        db.session.add(client)
+        db.session.commit()
+        found = [item['id'] for item in search.global_search(query)['clients']]
+        assert client.client_id in found
+        # Второе слово запроса проверяется тем же условием
+        found = [item['id'] for item in search.global_search(f'иван {query}')['clients']]
+        assert client.client_id in found
+
+
+def test_prefix_does_not_match_other_words(app):
+    with app.test_request_context():
+        db.session.add(Client(last_name='Тесла', first_name='Никола', phone='+375291112234'))
+        db.session.commit()
+        assert search.global_search('тест')['clients'] == []
@@ -0,0 +1,29 @@
+from sqlalchemy import select
+from app import db
+from app.models import Part, Supply
+
+# Форма поставки (user-009): поврежденный список запчастей не сохраняется.
+
+
+def test_mismatched_part_lists_are_rejected(app, admin_client, populate):
+    populate(50)
+    with app.app_context():
+        supply = db.session.get(Supply, db.session.scalars(
+            select(Part.supply_id).where(Part.work_order_id.isnot(None))).first())
+        parts_before = sorted((p.part_id, p.name, p.price, p.work_order_id) for p in supply.parts)
+        form = {
+            'supplier_id': supply.supplier_id,
+            'supply_date': supply.supply_date.isoformat(),
+            # part_id[] потерян для одной строки
+            'part_id[]': [str(part_id) for part_id, *_ in parts_before][1:],
+            'part_name[]': [name for _, name, _, _ in parts_before],
+            'part_price[]': [str(price) for _, _, price, _ in parts_before],
+        }
+        supply_id = supply.supply_id
+    response = admin_client.post(f'/admin/supply/manage/{supply_id}', data=form)
+    assert response.status_code == 302
+    with app.app_context():
+        supply = db.session.get(Supply, supply_id)
+        assert sorted((p.part_id, p.name, p.price, p.work_order_id) for p in supply.parts) == parts_before
+    with admin_client.session_transaction() as session:
+        assert any('поврежден' in message for _, message in session['_flashes'])